@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+# 本地离线回测引擎，直接运行 wequant/ 和 策略/ 下的策略脚本。
+
+from .engine import Engine, Result, load_strategy, run_backtest
+from .feed import CsvFeed, open_feed
+from .store import BarStore
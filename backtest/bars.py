@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+# 列式 bar 数据：每个字段一段连续的 numpy 数组，时间戳为 int64 秒（按平台时间，不带时区）。
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .constants import FIELDS, FREQUENCY_SECONDS
+
+EPOCH = datetime(1970, 1, 1)
+# 1970-01-05 是周一，周线从周一开始
+WEEK_OFFSET = 4 * 24 * 60 * 60
+
+
+def parse_time(value):
+    # 支持 "2017-09-1 00:00:00" 这类平台写法、datetime 以及整数秒
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime):
+        return int((value - EPOCH).total_seconds())
+    value = str(value).strip()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return int((datetime.strptime(value, fmt) - EPOCH).total_seconds())
+        except ValueError:
+            pass
+    raise ValueError("无法解析时间: %s" % value)
+
+
+def to_datetime(ts):
+    return EPOCH + timedelta(seconds=int(ts))
+
+
+def bucket_start(timestamp, frequency):
+    # 计算时间戳所在的 frequency 周期的起点
+    seconds = FREQUENCY_SECONDS[frequency]
+    offset = WEEK_OFFSET if frequency == "1w" else 0
+    return (timestamp - offset) // seconds * seconds + offset
+
+
+class Bars(object):
+    def __init__(self, timestamp, open, high, low, close, volume):
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_columns(cls, columns):
+        return cls(np.asarray(columns["timestamp"], dtype=np.int64),
+                   *[np.asarray(columns[field], dtype=np.float64) for field in FIELDS])
+
+    @classmethod
+    def empty(cls):
+        return cls.from_columns(dict((name, []) for name in ["timestamp"] + FIELDS))
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def columns(self):
+        return dict((name, getattr(self, name)) for name in ["timestamp"] + FIELDS)
+
+    def slice(self, start, stop):
+        # 只切视图，不复制
+        return Bars(*[getattr(self, name)[start:stop] for name in ["timestamp"] + FIELDS])
+
+    def search(self, timestamp, side="right"):
+        return int(np.searchsorted(self.timestamp, timestamp, side=side))
+
+
+def concat(parts):
+    parts = [bars for bars in parts if len(bars)]
+    if not parts:
+        return Bars.empty()
+    return Bars(*[np.concatenate([bars[name] for bars in parts]) for name in ["timestamp"] + FIELDS])
+
+
+def resample(bars, frequency):
+    # 把细粒度 bar 聚合成 frequency 周期的 bar
+    if len(bars) == 0:
+        return Bars.empty()
+    key = bucket_start(bars.timestamp, frequency)
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+    return Bars(key[starts],
+                bars.open[starts],
+                np.maximum.reduceat(bars.high, starts),
+                np.minimum.reduceat(bars.low, starts),
+                bars.close[ends],
+                np.add.reduceat(bars.volume, starts))
+
+
+def load_csv(path):
+    # 列：timestamp,open,high,low,close,volume；timestamp 可以是时间字符串或整数秒
+    import pandas as pd
+
+    frame = pd.read_csv(path)
+    frame.columns = [str(c).strip().lower() for c in frame.columns]
+    stamps = frame["timestamp"]
+    if stamps.dtype.kind in "iu":
+        timestamp = stamps.values.astype(np.int64)
+    else:
+        timestamp = pd.to_datetime(stamps).values.astype("datetime64[s]").astype(np.int64)
+    columns = dict((field, frame[field].values) for field in FIELDS)
+    columns["timestamp"] = timestamp
+    return Bars.from_columns(columns)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# 多标的回测：同一个策略脚本对多个标的（btc / ltc / eth）在同一条时间轴上同步推进，一次跑完。
+# 每个标的有自己的 context、账户、下单和 user_data，彼此独立，结果与分别回测一致；
+# 行情只加载一次，context.indicators 的均线和 RSI 对所有标的一起计算（见 indicators/batch.py）。
+#
+# 策略里下单要用 context.security 代替写死的币种，initialize 设置的 context.security 会被替换成当前标的；
+# PARAMS["account_initial"] 中该币种的初始数量换到当前标的名下，基准没有单独设置时也换成当前标的，
+# 脚本中写死的 context.account.<该币种> 读到的是当前标的的余额（见 Account 的 aliases）。
+#
+#     results = BatchEngine("my_rsi.py", feed, ["huobi_cny_btc", "huobi_cny_ltc"]).run()
+#     results["huobi_cny_ltc"].summary()
+
+import logging
+import sys
+
+import numpy as np
+
+from . import cache
+from .bars import parse_time
+from .constants import FREQUENCY_SECONDS
+from .context import Account, Clock, Context, Log, UserData
+from .data import Data
+from .engine import Engine, Result
+from .indicators.batch import BatchIndicators
+from .order import Order
+
+
+class Lane(object):
+    # 一个标的的回测状态
+    def __init__(self, security, context):
+        self.security = security
+        self.context = context
+        self.benchmark = None
+
+
+class BatchEngine(Engine):
+    def __init__(self, strategy, feed, securities, params=None, user_data=None,
+                 log_level=logging.INFO, log_stream=sys.stdout):
+        Engine.__init__(self, strategy, feed, params=params, user_data=user_data,
+                        log_level=log_level, log_stream=log_stream, mode="event")
+        if not securities:
+            raise ValueError("至少需要一个标的")
+        self.securities = list(securities)
+
+    def initialize(self):
+        # 为每个标的建立 context 并调用 initialize，返回共同时间轴上每个标的是否有 bar 的 mask
+        params = self.params
+        start = parse_time(params["start_time"])
+        end = parse_time(params["end_time"])
+
+        clock = Clock(0)
+        clock.advance(start)
+        data = Data(self.feed, clock)
+        indicators = BatchIndicators(data, self.securities, cache.from_params(params))
+        self.lanes = []
+        for i, security in enumerate(self.securities):
+            account = Account(params["account_initial"], data.get_current_price)
+            name = security if len(self.securities) > 1 else None
+            log = Log(clock, self.log_level, self.log_stream, name)
+            order = Order(account, data, log, params["commission"], params["slippage"], params["limit_fill"],
+                          params["participation"])
+            context = Context(clock, data, order, account, log, UserData(self.user_data), indicators.lane(i))
+            self.strategy.initialize(context)
+            declared = context.security
+            if declared != security:
+                if declared in account.balances:
+                    account.balances[security] = account.balances.pop(declared)
+                account.aliases[declared] = security
+                if context.benchmark in (None, declared):
+                    context.benchmark = security
+                context.security = security
+            self.lanes.append(Lane(security, context))
+
+        frequencies = set(lane.context.frequency for lane in self.lanes)
+        if len(frequencies) > 1:
+            raise ValueError("各标的的回测频率不一致: %s" % ", ".join(sorted(map(str, frequencies))))
+        frequency = frequencies.pop()
+        if frequency not in FREQUENCY_SECONDS:
+            raise ValueError("不支持的回测频率: %s" % frequency)
+        clock.seconds = FREQUENCY_SECONDS[frequency]
+        data.frequency = frequency
+        self.clock = clock
+        self.context = self.lanes[0].context
+
+        timestamps = []
+        for lane in self.lanes:
+            context = lane.context
+            lane.benchmark = context.benchmark or context.security
+            try:
+                data.bars(lane.benchmark)
+            except IOError:
+                context.log.warn("没有基准 %s 的行情数据，改用 %s 作为基准" % (lane.benchmark, context.security))
+                lane.benchmark = context.security
+            bars = data.bars(context.security)
+            timestamps.append(bars.timestamp[bars.search(start, side="left"):bars.search(end - clock.seconds)])
+        self.timestamp = np.unique(np.concatenate(timestamps))
+        return [np.isin(self.timestamp, lane_timestamps) for lane_timestamps in timestamps]
+
+    def run(self):
+        masks = self.initialize()
+        lanes = self.lanes
+        net = np.full((len(lanes), len(self.timestamp)), np.nan)
+        active = np.array(masks).T
+        for t, timestamp in enumerate(self.timestamp):
+            self.clock.advance(timestamp)
+            for i, lane in enumerate(lanes):
+                if not active[t, i]:
+                    continue
+                context = lane.context
+                if context.account_initial is None:
+                    context.account_initial = context.account.snapshot()
+                context.order.match()
+                self.strategy.handle_data(context)
+                net[i, t] = context.account.net()
+
+        results = {}
+        for i, lane in enumerate(lanes):
+            timestamps = self.timestamp[masks[i]]
+            context = lane.context
+            benchmark = self.benchmark_prices(timestamps, lane.benchmark)
+            results[lane.security] = Result(timestamps, net[i, masks[i]], benchmark, context.order.trades,
+                                            context.user_data.as_dict())
+        return results
+
+
+def run_batch(path, data_dir, securities, **kwargs):
+    from .feed import open_feed
+    return BatchEngine(path, open_feed(data_dir), securities, **kwargs).run()
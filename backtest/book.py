@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# 一个标的的限价挂单簿：买单按价格从高到低、卖单按价格从低到高，同价按挂单先后（价格-时间优先）。
+# 两边各是一个堆，挂单和撤单都是 O(log n)：撤单只从 live 中删除，堆顶遇到已撤销的挂单时再弹出。
+#
+# 回测中由 resting.py 使用，每根 bar 只看两边的最优价就能判断有没有挂单成交，
+# 有成交时一次取出这根 bar 上所有可以成交的价位。也可以单独用作本地模拟交易所的撮合核心：
+#
+#     book = OrderBook()
+#     book.add(order)                       # order 需要 order_id / side / price 属性
+#     for order in book.crossable(low, high):
+#         ...                               # 按优先级成交
+#         book.cancel(order.order_id)
+
+import heapq
+import itertools
+
+
+class OrderBook(object):
+    def __init__(self):
+        self._bids = []
+        self._asks = []
+        # order_id -> 挂单，撤销或成交后删除
+        self.live = {}
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.live)
+
+    def __contains__(self, order_id):
+        return order_id in self.live
+
+    def add(self, order):
+        self.live[order.order_id] = order
+        if order.side == "buy":
+            heapq.heappush(self._bids, (-order.price, next(self._sequence), order.order_id))
+        else:
+            heapq.heappush(self._asks, (order.price, next(self._sequence), order.order_id))
+
+    def cancel(self, order_id):
+        return self.live.pop(order_id, None)
+
+    def _top(self, heap):
+        while heap and heap[0][2] not in self.live:
+            heapq.heappop(heap)
+        return self.live[heap[0][2]] if heap else None
+
+    def best_bid(self):
+        order = self._top(self._bids)
+        return None if order is None else order.price
+
+    def best_ask(self):
+        order = self._top(self._asks)
+        return None if order is None else order.price
+
+    def crossable(self, low, high):
+        # 最低价为 low、最高价为 high 的 bar 上可以成交的所有挂单：先买单后卖单，各自按价格-时间优先。
+        # 不从挂单簿中删除，成交后由调用方 cancel
+        result = []
+        for heap, crosses in ((self._bids, lambda price: price >= low), (self._asks, lambda price: price <= high)):
+            popped = []
+            while self._top(heap) is not None and crosses(self.live[heap[0][2]].price):
+                entry = heapq.heappop(heap)
+                popped.append(entry)
+                result.append(self.live[entry[2]])
+            for entry in popped:
+                heapq.heappush(heap, entry)
+        return result
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# 指标的磁盘缓存：context.indicators 中流式指标的整段历史输出按
+# (标的, 频率, 数据版本, 指标, 参数) 保存成文件，下一次回测或扫描用 memmap 打开，不用再逐根预热。
+# 数据版本是 bar 内容的哈希，指标版本是 backtest/indicators 下全部源文件的哈希，数据或指标代码变了都不会命中旧的缓存；
+# 旧文件留在目录里，总大小超过 size 时按最近使用时间（命中时更新文件的 mtime）从最旧的开始删除。
+#
+# <root>/<key>.f8      (输出个数, bar 数) 的 float64
+# <root>/<key>.json    标的、频率、指标、参数，只用于查看
+#
+#     python -m backtest run wequant/macd/ltc.py --data store/ --indicator-cache cache/
+#
+# 缓存的是流式指标逐根推进得到的值，与不用缓存时逐位相同；返回给策略的仍然只到当前 bar。
+
+import hashlib
+import json
+import os
+import weakref
+
+import numpy as np
+
+from . import indicators
+from .constants import FIELDS
+
+# 数据版本按 bars 对象缓存，同一进程内每组 bar 只哈希一次
+_versions = weakref.WeakKeyDictionary()
+# 指标代码的版本，每个进程只算一次
+_sources = {}
+
+
+def data_version(bars):
+    # bar 时间和各字段内容的哈希
+    if bars not in _versions:
+        digest = hashlib.sha1()
+        for name in ["timestamp"] + FIELDS:
+            digest.update(np.ascontiguousarray(bars[name]).data)
+        _versions[bars] = digest.hexdigest()
+    return _versions[bars]
+
+
+def code_version():
+    # backtest/indicators 下所有源文件的哈希：指标之间共用 RollingSum 等辅助类，改了任何一个文件都作废全部缓存
+    if _sources.get("version") is None:
+        digest = hashlib.sha1()
+        directory = os.path.dirname(os.path.abspath(indicators.__file__))
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".py"):
+                digest.update(name.encode("utf-8"))
+                with open(os.path.join(directory, name), "rb") as f:
+                    digest.update(f.read())
+        _sources["version"] = digest.hexdigest()
+    return _sources["version"]
+
+
+def from_params(params):
+    # PARAMS 中设置了 indicator_cache 目录时返回缓存，否则返回 None
+    if not params.get("indicator_cache"):
+        return None
+    return IndicatorCache(params["indicator_cache"], params["indicator_cache_size"])
+
+
+class IndicatorCache(object):
+    def __init__(self, root, size):
+        self.root = root
+        self.size = int(size)
+
+    def key(self, security, frequency, bars, factory, params):
+        text = repr((security, frequency, data_version(bars), factory.__name__, code_version(),
+                     sorted(params.items())))
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key + ".f8")
+
+    def get(self, security, frequency, bars, factory, params, outputs, build):
+        # 返回 outputs 个整段历史的数组；没有缓存时调用 build() 算出并写入
+        key = self.key(security, frequency, bars, factory, params)
+        path = self.path(key)
+        shape = (outputs, len(bars))
+        if os.path.exists(path) and os.path.getsize(path) == outputs * len(bars) * 8:
+            try:
+                os.utime(path)
+            except OSError:
+                # 刚好被其它进程淘汰，已经打开的 memmap 不受影响
+                pass
+            table = np.memmap(path, dtype=np.float64, mode="r", shape=shape).view(np.ndarray)
+            return list(table)
+        table = np.ascontiguousarray(build(), dtype=np.float64).reshape(shape)
+        self.put(key, table, {"security": security, "frequency": frequency, "indicator": factory.__name__,
+                              "params": dict(params), "bars": len(bars)})
+        return list(table)
+
+    def put(self, key, table, info):
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root, exist_ok=True)
+        # 扫描时多个进程可能同时写同一个指标，各自写自己的临时文件再改名
+        base = os.path.join(self.root, key)
+        temp = "%s.%d.tmp" % (base, os.getpid())
+        with open(temp, "w") as f:
+            json.dump(info, f, default=repr)
+        os.replace(temp, base + ".json")
+        table.tofile(temp)
+        os.replace(temp, base + ".f8")
+        self.evict(keep=key)
+
+    def entries(self):
+        # [(最近使用时间, 字节数, key)]，从最旧的开始
+        result = []
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            if not name.endswith(".f8"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except OSError:
+                continue
+            result.append((stat.st_mtime, stat.st_size, name[:-len(".f8")]))
+        return sorted(result)
+
+    def evict(self, keep=None):
+        # 总大小超过 size 时删除最久没有用到的指标，keep 为刚写入的不删
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.size:
+                break
+            if key != keep:
+                self._remove(key)
+                total -= size
+
+    def clear(self):
+        for _, _, key in self.entries():
+            self._remove(key)
+
+    def _remove(self, key):
+        for path in (self.path(key), os.path.join(self.root, key + ".json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+# 命令行入口：python -m backtest run wequant/tutle/ltc.py --data data/
+
+import argparse
+import ast
+import sys
+
+
+def parse_value(text):
+    # 按 Python 字面量解析，解析不了时保留字符串
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def parse_assignments(items):
+    # "T=20" -> {"T": 20}
+    values = {}
+    for item in items or []:
+        name, _, value = item.partition("=")
+        values[name] = parse_value(value)
+    return values
+
+
+def parse_axes(items):
+    # "T=10,20,30" -> {"T": [10, 20, 30]}
+    axes = {}
+    for item in items or []:
+        name, _, values = item.partition("=")
+        axes[name] = [parse_value(value) for value in values.split(",")]
+    return axes
+
+
+def parse_ranges(items):
+    # "K1=0.1:0.5" -> {"K1": (0.1, 0.5)}
+    ranges = {}
+    for item in items or []:
+        name, _, bounds = item.partition("=")
+        low, _, high = bounds.partition(":")
+        ranges[name] = (parse_value(low), parse_value(high))
+    return ranges
+
+
+def cmd_run(args):
+    from .batch import BatchEngine
+    from .engine import Engine
+    from .feed import open_feed
+
+    params = {}
+    if args.start:
+        params["start_time"] = args.start
+    if args.end:
+        params["end_time"] = args.end
+    if args.limit_fill:
+        params["limit_fill"] = args.limit_fill
+    if args.participation is not None:
+        params["participation"] = args.participation
+    if args.indicator_cache:
+        params["indicator_cache"] = args.indicator_cache
+    if args.indicator_cache_size is not None:
+        params["indicator_cache_size"] = int(args.indicator_cache_size * (1 << 20))
+    log_stream = None if args.quiet else sys.stdout
+    if args.securities:
+        engine = BatchEngine(args.strategy, open_feed(args.data), args.securities.split(","), params=params,
+                             user_data=parse_assignments(args.set), log_stream=log_stream)
+        results = engine.run()
+    else:
+        engine = Engine(args.strategy, open_feed(args.data), params=params,
+                        user_data=parse_assignments(args.set), log_stream=log_stream, mode=args.mode)
+        results = {None: engine.run()}
+    for security, result in results.items():
+        if security:
+            print("[%s]" % security)
+        for key, value in result.summary().items():
+            print("%s: %s" % (key, value))
+
+
+def cmd_sweep(args):
+    from .sweep import grid, latin_hypercube, random_samples, sweep
+
+    combos = grid(**parse_axes(args.grid))
+    if args.samples:
+        sampler = latin_hypercube if args.method == "lhs" else random_samples
+        samples = sampler(parse_ranges(args.range), args.samples, args.seed)
+        combos = [dict(a, **b) for a in combos for b in samples]
+    params = {}
+    if args.start:
+        params["start_time"] = args.start
+    if args.end:
+        params["end_time"] = args.end
+    if args.limit_fill:
+        params["limit_fill"] = args.limit_fill
+    if args.participation is not None:
+        params["participation"] = args.participation
+    if args.indicator_cache:
+        params["indicator_cache"] = args.indicator_cache
+    if args.indicator_cache_size is not None:
+        params["indicator_cache_size"] = int(args.indicator_cache_size * (1 << 20))
+    table = sweep(args.strategy, args.data, combos, params=params, workers=args.workers, mode=args.mode)
+    if "return" in table:
+        table = table.sort_values("return", ascending=False)
+    if args.out:
+        table.to_csv(args.out, index=False)
+    print(table.head(args.top).to_string(index=False))
+
+
+def cmd_convert(args):
+    from .feed import CsvFeed
+    from .store import BarStore
+
+    feed = CsvFeed(args.data)
+    store = BarStore(args.out)
+    for security in args.security:
+        store.write_frequencies(security, feed.bars(security, args.frequency), args.frequency)
+        print("%s: %s bars" % (security, store.meta(security, args.frequency)["length"]))
+
+
+def cmd_ingest(args):
+    from .ingest import ingest
+    from .store import BarStore
+
+    meta = ingest(BarStore(args.out), args.security, args.path, frequency=args.frequency, gaps=args.gaps,
+                  chunksize=args.chunk, fmt=args.format)
+    print("%s: %s bars, %s gaps, %s bars filled" % (args.security, meta["length"], len(meta["gaps"]),
+                                                    meta["filled"]))
+
+
+def cmd_export(args):
+    from .export import export
+
+    params = parse_assignments(args.set)
+    if args.format == "npy":
+        if not args.out:
+            raise SystemExit("--format npy 需要 --out")
+        export(args.data, args.security, args.frequency, args.indicator, params, args.start, args.end,
+               args.out, "npy", args.workers, args.warmup)
+    elif args.out:
+        with open(args.out, "w") as out:
+            export(args.data, args.security, args.frequency, args.indicator, params, args.start, args.end,
+                   out, "text", args.workers, args.warmup, args.precision)
+    else:
+        export(args.data, args.security, args.frequency, args.indicator, params, args.start, args.end,
+               sys.stdout, "text", args.workers, args.warmup, args.precision)
+
+
+def cmd_selfcheck(args):
+    from .selfcheck import run
+
+    run()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m backtest")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run = commands.add_parser("run", help="回测一个策略脚本")
+    run.add_argument("strategy", help="策略文件路径")
+    run.add_argument("--data", required=True, help="本地行情目录（CSV 或 bar 存储）")
+    run.add_argument("--start", help="覆盖 PARAMS['start_time']")
+    run.add_argument("--end", help="覆盖 PARAMS['end_time']")
+    run.add_argument("--set", action="append", metavar="NAME=VALUE", help="覆盖 context.user_data 中的参数")
+    run.add_argument("--quiet", action="store_true", help="不输出策略日志")
+    run.add_argument("--mode", choices=["auto", "event", "signal"], default="auto",
+                     help="event 逐 bar 调用 handle_data，signal 使用策略的 signals 向量化回测")
+    run.add_argument("--securities", metavar="SEC1,SEC2,...",
+                     help="对多个标的同时回测（逐 bar 模式），代替策略里设置的 context.security")
+    run.add_argument("--limit-fill", choices=["immediate", "bars"],
+                     help="bars: 当前价格不能成交的限价单挂单，由之后的 bar 撮合")
+    run.add_argument("--participation", type=float, help="挂单每根 bar 最多成交 bar 成交量的比例")
+    run.add_argument("--indicator-cache", metavar="DIR",
+                     help="context.indicators 的整段指标保存到这个目录，之后的回测直接读出")
+    run.add_argument("--indicator-cache-size", type=float, metavar="MB", help="指标缓存的大小上限，默认 2048 MB")
+    run.set_defaults(func=cmd_run)
+
+    sweep = commands.add_parser("sweep", help="并行扫描 user_data 参数")
+    sweep.add_argument("strategy", help="策略文件路径")
+    sweep.add_argument("--data", required=True, help="本地行情目录，建议用 bar 存储")
+    sweep.add_argument("--start", help="覆盖 PARAMS['start_time']")
+    sweep.add_argument("--end", help="覆盖 PARAMS['end_time']")
+    sweep.add_argument("--grid", action="append", metavar="NAME=V1,V2,...", help="网格参数")
+    sweep.add_argument("--range", action="append", metavar="NAME=LOW:HIGH", help="随机采样的参数区间")
+    sweep.add_argument("--samples", type=int, help="随机采样的组数")
+    sweep.add_argument("--method", choices=["random", "lhs"], default="lhs", help="采样方式")
+    sweep.add_argument("--seed", type=int, help="随机种子")
+    sweep.add_argument("--workers", type=int, help="进程数，默认为 CPU 数")
+    sweep.add_argument("--out", help="结果写入 CSV")
+    sweep.add_argument("--top", type=int, default=20, help="打印收益最高的前几组")
+    sweep.add_argument("--mode", choices=["auto", "event", "signal"], default="auto", help="回测模式，见 run")
+    sweep.add_argument("--limit-fill", choices=["immediate", "bars"], help="限价单撮合方式，见 run")
+    sweep.add_argument("--participation", type=float, help="成交量参与率，见 run")
+    sweep.add_argument("--indicator-cache", metavar="DIR", help="指标缓存目录，见 run")
+    sweep.add_argument("--indicator-cache-size", type=float, metavar="MB", help="指标缓存的大小上限，见 run")
+    sweep.set_defaults(func=cmd_sweep)
+
+    convert = commands.add_parser("convert", help="把 CSV 行情转换成 bar 存储，并生成所有频率")
+    convert.add_argument("security", nargs="+")
+    convert.add_argument("--data", required=True, help="CSV 行情目录")
+    convert.add_argument("--out", required=True, help="bar 存储目录")
+    convert.add_argument("--frequency", default="1m", help="源数据频率")
+    convert.set_defaults(func=cmd_convert)
+
+    ingest = commands.add_parser("ingest", help="流式导入交易所的 K 线文件（CSV / JSON），并生成所有更粗的频率")
+    ingest.add_argument("security")
+    ingest.add_argument("path", nargs="+", help="K 线文件，多个文件按顺序拼接")
+    ingest.add_argument("--out", required=True, help="bar 存储目录")
+    ingest.add_argument("--frequency", default="1m", help="K 线频率")
+    ingest.add_argument("--gaps", choices=["flag", "fill"], default="flag",
+                        help="flag 只在 meta.json 中记录缺失的 bar，fill 用前收盘价补齐")
+    ingest.add_argument("--format", choices=["csv", "json"], help="默认按扩展名判断")
+    ingest.add_argument("--chunk", type=int, default=100000, help="每次读入的行数")
+    ingest.set_defaults(func=cmd_ingest)
+
+    export = commands.add_parser("export", help="一次算出一段时间的指标，按 \"时间;值\" 逐行导出")
+    export.add_argument("security")
+    export.add_argument("indicator", help="ATR, AR, EMV, RSI, KDJ, MACD, BBANDS, KAMA, HT_TRENDLINE")
+    export.add_argument("--data", required=True, help="本地行情目录，建议用 bar 存储")
+    export.add_argument("--frequency", default="1m", help="bar 频率")
+    export.add_argument("--start", help="起始时间（含）")
+    export.add_argument("--end", help="结束时间（不含），按 bar 的起始时间")
+    export.add_argument("--set", action="append", metavar="NAME=VALUE", help="指标参数，如 timeperiod=14")
+    export.add_argument("--out", help="输出文件，默认输出到标准输出")
+    export.add_argument("--format", choices=["text", "npy"], default="text", help="npy 为二进制的结构化数组")
+    export.add_argument("--workers", type=int, default=1, help="区间很长时分段并行的进程数")
+    export.add_argument("--warmup", type=int, help="分段时每段向前预热的 bar 数，默认按指标的 lookback")
+    export.add_argument("--precision", type=int, default=12, help="文本输出的有效数字位数")
+    export.set_defaults(func=cmd_export)
+
+    selfcheck = commands.add_parser("selfcheck", help="在构造的数据上核对指标和挂单撮合的边界情况")
+    selfcheck.set_defaults(func=cmd_selfcheck)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+# 本地回测引擎用到的常量，与 wequant 平台保持一致。
+
+# 平台支持的回测频率，以及每根 bar 的秒数
+FREQUENCY_SECONDS = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "30m": 30 * 60,
+    "60m": 60 * 60,
+    "4h": 4 * 60 * 60,
+    "1d": 24 * 60 * 60,
+    "1w": 7 * 24 * 60 * 60,
+}
+FREQUENCIES = ["1m", "5m", "15m", "30m", "60m", "4h", "1d", "1w"]
+
+# bar 的字段
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+# 现金账户名
+CASH = "huobi_cny_cash"
+
+# 平台在策略模块中注入的全局常量：交易所最小下单数量和最小下单金额
+STRATEGY_GLOBALS = {
+    "HUOBI_CNY_BTC_MIN_ORDER_QUANTITY": 0.001,
+    "HUOBI_CNY_LTC_MIN_ORDER_QUANTITY": 0.01,
+    "HUOBI_CNY_ETH_MIN_ORDER_QUANTITY": 0.01,
+    "HUOBI_CNY_BTC_MIN_ORDER_CASH_AMOUNT": 1,
+    "HUOBI_CNY_LTC_MIN_ORDER_CASH_AMOUNT": 1,
+    "HUOBI_CNY_ETH_MIN_ORDER_CASH_AMOUNT": 1,
+}
+
+# 回测参数缺省值
+DEFAULT_PARAMS = {
+    "commission": 0.002,
+    "slippage": 0.001,
+    "account_initial": {CASH: 100000},
+    # 限价单的撮合方式，见 order.py
+    "limit_fill": "immediate",
+    "participation": None,
+    # 指标的磁盘缓存目录和大小上限（字节），见 cache.py
+    "indicator_cache": None,
+    "indicator_cache_size": 2 << 30,
+}
+
+
+def min_order_quantity(security):
+    return STRATEGY_GLOBALS.get("%s_MIN_ORDER_QUANTITY" % security.upper(), 0)
+
+
+def min_order_cash_amount(security):
+    return STRATEGY_GLOBALS.get("%s_MIN_ORDER_CASH_AMOUNT" % security.upper(), 0)
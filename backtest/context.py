@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# 策略运行时的 context 对象，对应平台的 context.account / context.log / context.time / context.user_data。
+
+import logging
+import sys
+
+from .bars import to_datetime
+from .constants import CASH
+from .triggers import Triggers
+
+
+class Clock(object):
+    # 当前 bar 的起始时间 now 以及结束时间 end（秒）
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.now = None
+        self.end = None
+
+    def advance(self, timestamp):
+        self.now = int(timestamp)
+        self.end = self.now + self.seconds
+
+
+class UserData(object):
+    # 用户自定义变量。_pinned 中的值不会被策略覆盖（包括 init_local_context 这类重置函数），用于参数扫描
+    def __init__(self, pinned=None):
+        object.__setattr__(self, "_pinned", dict(pinned or {}))
+        for name, value in self._pinned.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        if name in self._pinned:
+            return
+        object.__setattr__(self, name, value)
+
+    def as_dict(self):
+        return dict((k, v) for k, v in vars(self).items() if not k.startswith("_"))
+
+
+class Account(object):
+    # 账户余额，属性名即平台的资产名：huobi_cny_cash, huobi_cny_btc, ...
+    # huobi_cny_net 为按 price_of 计算的总资产；aliases 把资产名换成另一个，
+    # 多标的回测中脚本写死的币种（如 context.account.huobi_cny_btc）读到的是当前标的的余额
+    def __init__(self, balances, price_of, aliases=None):
+        object.__setattr__(self, "balances", dict((k, float(v)) for k, v in balances.items()))
+        object.__setattr__(self, "price_of", price_of)
+        object.__setattr__(self, "aliases", dict(aliases or {}))
+
+    def __getattr__(self, name):
+        if name == "huobi_cny_net":
+            return self.net()
+        if name.startswith("huobi_cny_"):
+            return self.balances.get(self.aliases.get(name, name), 0.0)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("account 是只读的")
+
+    def net(self):
+        total = self.balances.get(CASH, 0.0)
+        for asset, amount in self.balances.items():
+            if asset != CASH and amount:
+                price = self.price_of(asset)
+                if price is not None:
+                    total += amount * price
+        return total
+
+    def snapshot(self):
+        prices = dict((asset, self.price_of(asset)) for asset in self.balances if asset != CASH)
+        return Account(self.balances, prices.get, self.aliases)
+
+
+class Log(object):
+    # 输出格式与平台日志一致："2017-08-18 01:00:00 - INFO - ..."
+    # name 不为空时加在消息前面，多标的一起回测时用来区分是哪个标的的日志
+    def __init__(self, clock, level=logging.INFO, stream=sys.stdout, name=None):
+        self.clock = clock
+        self.level = level
+        self.stream = stream
+        self.name = name
+
+    def set_level(self, level):
+        self.level = level
+
+    def _emit(self, level, msg):
+        if self.stream is None or level < self.level:
+            return
+        if self.name:
+            msg = "[%s] %s" % (self.name, msg)
+        self.stream.write("%s - %s - %s\n" % (to_datetime(self.clock.now), logging.getLevelName(level), msg))
+
+    def debug(self, msg):
+        self._emit(logging.DEBUG, msg)
+
+    def info(self, msg):
+        self._emit(logging.INFO, msg)
+
+    def warn(self, msg):
+        self._emit(logging.WARNING, msg)
+
+    warning = warn
+
+    def error(self, msg):
+        self._emit(logging.ERROR, msg)
+
+
+class Time(object):
+    def __init__(self, clock):
+        self.clock = clock
+
+    def get_current_bar_time(self):
+        return to_datetime(self.clock.now)
+
+
+class Context(object):
+    def __init__(self, clock, data, order, account, log, user_data=None, indicators=None):
+        self.data = data
+        self.indicators = indicators
+        # 本地回测中登记价格触发，见 triggers.py
+        self.triggers = Triggers(data)
+        self.order = order
+        self.account = account
+        self.account_initial = None
+        self.log = log
+        self.time = Time(clock)
+        self.user_data = user_data if user_data is not None else UserData()
+        self.frequency = None
+        self.benchmark = None
+        self.security = None
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# context.data：按当前 bar 时间提供历史行情，不会看到未来数据。
+
+from .bars import bucket_start, parse_time
+from .constants import FIELDS, FREQUENCY_SECONDS
+from .window import HistoryWindow, PriceArrays, readonly
+
+NAN = float("nan")
+# 时间前进时游标最多逐根往后数这么多根，再远就二分查找
+CURSOR_STEPS = 16
+
+
+class SessionStats(object):
+    # 一个交易日（按 bar 时间的自然日）或其它周期的开高低收和成交量，bars 为已经走完的 bar 数
+    def __init__(self, start, open=NAN, high=NAN, low=NAN, close=NAN, volume=0.0, bars=0, previous=None):
+        self.start = start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.bars = bars
+        # 上一根走完的日线，没有时为 None
+        self.previous = previous
+
+    def __repr__(self):
+        return "SessionStats(start=%s, open=%s, high=%s, low=%s, close=%s, volume=%s, bars=%s)" % (
+            self.start, self.open, self.high, self.low, self.close, self.volume, self.bars)
+
+
+class Cursor(object):
+    # 一个 (标的, 频率) 对齐到当前时间的位置：截至 end 已经走完的 bar 数。
+    # 时间前进时从上次的位置往后数，每根 bar 均摊 O(1)；跳得很远（如价格触发跳过的 bar）或时间倒退时重新二分查找
+    def __init__(self, bars, seconds):
+        self.bars = bars
+        self.seconds = seconds
+        self.end = None
+        self.stop = 0
+
+    def seek(self, end):
+        if end == self.end:
+            return self.stop
+        target = end - self.seconds
+        stop = self.stop
+        if self.end is None or end < self.end:
+            stop = self.bars.search(target)
+        else:
+            timestamp = self.bars.timestamp
+            limit = min(len(timestamp), stop + CURSOR_STEPS)
+            while stop < limit and timestamp[stop] <= target:
+                stop += 1
+            if stop == limit and stop < len(timestamp) and timestamp[stop] <= target:
+                stop = self.bars.search(target)
+        self.end = end
+        self.stop = stop
+        return stop
+
+
+class Data(object):
+    def __init__(self, feed, clock):
+        self.feed = feed
+        self.clock = clock
+        # 回测频率，initialize 之后由引擎设置
+        self.frequency = None
+        # (security, frequency) -> Cursor
+        self._cursors = {}
+        # (security, 周期, 基础频率) -> [当前周期的统计, 已经统计到的 bar 下标]
+        self._forming = {}
+        # (security, 周期) -> (下标, 上一根走完的 bar)
+        self._previous = {}
+
+    def bars(self, security, frequency=None):
+        return self.feed.bars(security, frequency or self.frequency)
+
+    def cursor(self, security, frequency=None):
+        # 截至当前 bar 结束时已经走完的 bar 数目。每个 (标的, 频率) 保留一个游标，随时钟往后移动
+        key = (security, frequency or self.frequency)
+        cursor = self._cursors.get(key)
+        if cursor is None:
+            cursor = self._cursors[key] = Cursor(self.bars(*key), FREQUENCY_SECONDS[key[1]])
+        return cursor.seek(self.clock.end)
+
+    def _range(self, security, count, start_time, end_time, frequency):
+        frequency = frequency or self.frequency
+        bars = self.bars(security, frequency)
+        stop = self.cursor(security, frequency)
+        if end_time is not None:
+            stop = min(stop, bars.search(parse_time(end_time)))
+        start = 0
+        if start_time is not None:
+            start = bars.search(parse_time(start_time), side="left")
+        if count is not None:
+            start = max(start, stop - int(count))
+        return bars, min(start, stop), stop
+
+    def get_price(self, security, count=None, start_time=None, end_time=None, frequency=None):
+        return HistoryWindow(*self._range(security, count, start_time, end_time, frequency))
+
+    def get_price_array(self, security, field="close", count=None, start_time=None, end_time=None, frequency=None):
+        # 与 np.array(get_price(...)[field]) 的值相同，但直接返回 bar 数据的只读 ndarray 视图，不经过 pandas
+        bars, start, stop = self._range(security, count, start_time, end_time, frequency)
+        return readonly(bars[field][start:stop])
+
+    def get_price_arrays(self, security, fields=FIELDS, count=None, start_time=None, end_time=None, frequency=None):
+        # 多个字段一起取，arrays["high"] / arrays.high 为只读视图，arrays.timestamp 为 bar 的起始时间（秒）
+        bars, start, stop = self._range(security, count, start_time, end_time, frequency)
+        return PriceArrays(bars, start, stop, fields)
+
+    def get_current_price(self, security):
+        bars = self.bars(security)
+        i = self.cursor(security)
+        if i == 0:
+            return None
+        return float(bars.close[i - 1])
+
+    def get_session_stats(self, security, frequency=None):
+        # 当日截至当前 bar 的开高低收，与 get_price(start_time=当日 00:00:00) 的结果一致，
+        # 但只累加新走完的 bar，每根 bar O(1)；跨日时重新开始
+        return self.get_forming_bar(security, "1d", frequency)
+
+    def get_forming_bar(self, security, frequency, base=None):
+        # 当前 bar 所在的 frequency 周期（如 4h 回测中的当日、1m 回测中的当前 4h）截至当前 bar 的开高低收，
+        # 由 base 频率（默认为回测频率）已经走完的 bar 逐根累加；previous 为上一根走完的 frequency bar
+        base = base or self.frequency
+        bars = self.bars(security, base)
+        stop = self.cursor(security, base)
+        start = int(bucket_start(self.clock.now, frequency))
+        key = (security, frequency, base)
+        forming = self._forming.get(key)
+        if forming is None or forming[0].start != start:
+            forming = [SessionStats(start), bars.search(start, side="left")]
+            self._forming[key] = forming
+        stats, consumed = forming
+        for i in range(consumed, stop):
+            if stats.bars == 0:
+                stats.open, stats.high, stats.low = float(bars.open[i]), float(bars.high[i]), float(bars.low[i])
+            else:
+                stats.high = max(stats.high, float(bars.high[i]))
+                stats.low = min(stats.low, float(bars.low[i]))
+            stats.close = float(bars.close[i])
+            stats.volume += float(bars.volume[i])
+            stats.bars += 1
+        forming[1] = max(consumed, stop)
+
+        i = self.cursor(security, frequency)
+        cached = self._previous.get((security, frequency))
+        if cached is None or cached[0] != i:
+            completed = self.bars(security, frequency)
+            previous = None
+            if i > 0:
+                previous = SessionStats(int(completed.timestamp[i - 1]), float(completed.open[i - 1]),
+                                        float(completed.high[i - 1]), float(completed.low[i - 1]),
+                                        float(completed.close[i - 1]), float(completed.volume[i - 1]), 1)
+            cached = self._previous[(security, frequency)] = (i, previous)
+        previous = cached[1]
+        return SessionStats(stats.start, stats.open, stats.high, stats.low, stats.close, stats.volume, stats.bars,
+                            previous)
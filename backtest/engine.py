@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+# 本地回测引擎：加载 wequant 风格的策略脚本（PARAMS / initialize / handle_data），
+# 在本地行情上逐 bar 回放。
+
+import importlib.util
+import logging
+import os
+import sys
+
+import numpy as np
+
+from . import cache
+from .bars import parse_time, to_datetime
+from .constants import CASH, DEFAULT_PARAMS, FREQUENCY_SECONDS, STRATEGY_GLOBALS
+from .context import Account, Clock, Context, Log, UserData
+from .data import Data
+from .indicators import Indicators
+from .order import Order
+
+
+def load_strategy(path):
+    # 策略文件名可能带中文或 "-"，所以按路径加载；先注入平台提供的全局常量再执行模块
+    name = "strategy_%s" % abs(hash(os.path.abspath(path)))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    module.__dict__.update(STRATEGY_GLOBALS)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Result(object):
+    def __init__(self, timestamp, net, benchmark, trades, user_data):
+        self.timestamp = timestamp
+        self.net = net
+        self.benchmark = benchmark
+        self.trades = trades
+        self.user_data = user_data
+
+    def net_series(self):
+        import pandas as pd
+        return pd.Series(self.net, index=pd.DatetimeIndex(self.timestamp.astype("datetime64[s]")), name="net")
+
+    def summary(self):
+        if len(self.net) == 0:
+            return {"bars": 0}
+        peak = np.maximum.accumulate(self.net)
+        return {
+            "start": str(to_datetime(self.timestamp[0])),
+            "end": str(to_datetime(self.timestamp[-1])),
+            "bars": len(self.net),
+            "net": float(self.net[-1]),
+            "return": float(self.net[-1] / self.net[0] - 1),
+            "benchmark_return": float(self.benchmark[-1] / self.benchmark[0] - 1),
+            "max_drawdown": float(np.max(1 - self.net / peak)),
+            "trades": len(self.trades),
+        }
+
+
+class Engine(object):
+    # mode: "event" 逐 bar 调用 handle_data；"signal" 调用策略的 signals(context, bars) 向量化回测；
+    # "auto" 在策略没有 handle_data 而有 signals 时使用 signal 模式
+    def __init__(self, strategy, feed, params=None, user_data=None,
+                 log_level=logging.INFO, log_stream=sys.stdout, mode="auto"):
+        if isinstance(strategy, str):
+            strategy = load_strategy(strategy)
+        self.strategy = strategy
+        self.feed = feed
+        self.params = dict(DEFAULT_PARAMS)
+        self.params.update(getattr(strategy, "PARAMS", {}))
+        self.params.update(params or {})
+        self.user_data = user_data or {}
+        self.log_level = log_level
+        self.log_stream = log_stream
+        if mode == "auto":
+            mode = "signal" if hasattr(strategy, "signals") and not hasattr(strategy, "handle_data") else "event"
+        if mode not in ("event", "signal"):
+            raise ValueError("不支持的回测模式: %s" % mode)
+        self.mode = mode
+
+    def initialize(self):
+        # 建立 context 并调用策略的 initialize，返回回测区间内的 bar 下标 [first, last)
+        params = self.params
+        start = parse_time(params["start_time"])
+        end = parse_time(params["end_time"])
+
+        clock = Clock(0)
+        clock.advance(start)
+        data = Data(self.feed, clock)
+        account = Account(params["account_initial"], data.get_current_price)
+        log = Log(clock, self.log_level, self.log_stream)
+        order = Order(account, data, log, params["commission"], params["slippage"], params["limit_fill"],
+                      params["participation"])
+        context = Context(clock, data, order, account, log, UserData(self.user_data),
+                          Indicators(data, cache.from_params(params)))
+
+        self.strategy.initialize(context)
+        if context.frequency not in FREQUENCY_SECONDS:
+            raise ValueError("不支持的回测频率: %s" % context.frequency)
+        clock.seconds = FREQUENCY_SECONDS[context.frequency]
+        data.frequency = context.frequency
+        self.benchmark = context.benchmark or context.security
+        try:
+            data.bars(self.benchmark)
+        except IOError:
+            log.warn("没有基准 %s 的行情数据，改用 %s 作为基准" % (self.benchmark, context.security))
+            self.benchmark = context.security
+        self.clock = clock
+        self.context = context
+
+        bars = data.bars(context.security)
+        return bars.search(start, side="left"), bars.search(end - clock.seconds)
+
+    def benchmark_prices(self, timestamps, benchmark=None):
+        # 每根 bar 结束时基准的最新价格
+        bars = self.context.data.bars(benchmark or self.benchmark)
+        index = np.searchsorted(bars.timestamp, timestamps, side="right") - 1
+        return np.where(index >= 0, bars.close[np.maximum(index, 0)], np.nan)
+
+    def run(self):
+        first, last = self.initialize()
+        if self.mode == "signal":
+            from .vectorized import run_signals
+            return run_signals(self, first, last)
+        context = self.context
+        timestamps = np.array(context.data.bars(context.security).timestamp[first:last])
+        net = np.empty(len(timestamps))
+        triggers, order, data = context.triggers, context.order, context.data
+        i = wake = 0
+        while i < len(timestamps):
+            self.clock.advance(timestamps[i])
+            if context.account_initial is None:
+                context.account_initial = context.account.snapshot()
+            # 挂单先按这根 bar 撮合；有成交时即使没到登记的价位也调用 handle_data
+            if order.match() or i >= wake:
+                triggers.clear()
+                self.strategy.handle_data(context)
+                # 策略登记了价格触发时，下一次调用是第一根触及价位的 bar
+                wake = triggers.next_wake(timestamps, i + 1) if triggers.active else i + 1
+            net[i] = context.account.net()
+            # 在那之前可能有挂单成交的 bar 也要停下来撮合，其余的 bar 余额不变
+            following = order.resting.next_touch(data.bars, timestamps, i + 1, wake)
+            net[i + 1:following] = self.holding_net(timestamps[i + 1:following])
+            i = following
+        return Result(timestamps, net, self.benchmark_prices(timestamps), context.order.trades,
+                      context.user_data.as_dict())
+
+    def holding_net(self, timestamps):
+        # 余额不变时各 bar 的净值，与 Account.net 的累加顺序相同
+        data = self.context.data
+        balances = self.context.account.balances
+        net = np.full(len(timestamps), balances.get(CASH, 0.0))
+        for asset, amount in balances.items():
+            if asset != CASH and amount:
+                bars = data.bars(asset)
+                index = np.searchsorted(bars.timestamp, timestamps, side="right")
+                net += np.where(index > 0, amount * bars.close[np.maximum(index - 1, 0)], 0.0)
+        return net
+
+
+def run_backtest(path, data_dir, **kwargs):
+    from .feed import open_feed
+    return Engine(path, open_feed(data_dir), **kwargs).run()
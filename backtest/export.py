@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+# 指标批量导出：对一段时间一次算出整列指标，按 "时间;值" 逐行写出，
+# 与 wequant/atrx、wequant/arx 中逐根 bar 打日志得到的 txt 格式相同（时间为 bar 的结束时间，与平台日志一致）。
+# 多个输出的指标（MACD、BBANDS、KDJ）每行依次写出各个值，用 ";" 分隔。
+#
+#     python -m backtest export huobi_cny_ltc ATR --data store/ --frequency 30m \
+#         --start "2017-09-01 00:00:00" --end "2017-09-08 12:00:00" --set timeperiod=14 --set mode=simple
+#
+# 区间很长时按 bar 数切成几段并行计算，每段向前多取 warmup 根 bar 预热：
+# 只依赖最近若干根 bar 的指标预热够了就与整段计算一致：AR、EMV、simple ATR 每个值只由窗口内的 bar 算出，逐位相同；
+# BBANDS、KDJ（talib 和 stream.py 都是滚动累加）分段后累加的起点不同，与整段计算只差浮点舍入误差，不保证逐位相同；
+# 递归平滑的指标（RSI、MACD、KAMA、HT_TRENDLINE、wilder ATR）与从第一根 bar 算起的结果差一个随预热长度衰减的误差，
+# 不分段（workers=1）时总是从第一根 bar 算起。
+# RSI / KDJ / MACD / BBANDS / KAMA / HT_TRENDLINE 装了 talib 时用 talib，否则逐根调用 stream.py 中的增量版本。
+
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .bars import parse_time
+from .constants import FREQUENCY_SECONDS
+from .feed import open_feed
+from .indicators import stream
+from .indicators.ar import ar
+from .indicators.atr import atr
+from .indicators.emv import emv
+
+try:
+    import talib
+except ImportError:
+    talib = None
+
+FORMATS = ("text", "npy")
+# 递归平滑的指标在 lookback 之外默认再预热的 bar 数
+RECURSIVE_WARMUP = 1000
+# 超过这么多根 bar 才分段并行
+SHARD_BARS = 200000
+# 文本输出每次写出的行数
+WRITE_CHUNK = 65536
+
+# 每个工作进程自己的行情数据源，按目录缓存
+_feeds = {}
+
+
+def _stream(factory, columns, params, outputs):
+    # 没有 talib 时逐根调用增量指标
+    indicator = factory(**params)
+    result = np.full((outputs, len(columns[0])), np.nan)
+    for i, values in enumerate(zip(*columns)):
+        value = indicator.update(*values)
+        result[:, i] = value
+    return list(result)
+
+
+def _rsi(columns, params):
+    if talib is not None:
+        return [talib.RSI(columns[0], **params)]
+    return _stream(stream.RSI, columns, params, 1)
+
+
+def _kdj(columns, params):
+    if talib is not None:
+        k, d = talib.STOCH(*columns, **params)
+    else:
+        k, d = _stream(stream.STOCH, columns, params, 2)
+    return [k, d, 3 * k - 2 * d]
+
+
+def _macd(columns, params):
+    if talib is not None:
+        return list(talib.MACD(columns[0], **params))
+    return _stream(stream.MACD, columns, params, 3)
+
+
+def _bbands(columns, params):
+    if talib is not None:
+        return list(talib.BBANDS(columns[0], **params))
+    return _stream(stream.BBANDS, columns, params, 3)
+
+
+def _kama(columns, params):
+    if talib is not None:
+        return [talib.KAMA(columns[0], **params)]
+    return _stream(stream.KAMA, columns, params, 1)
+
+
+def _ht_trendline(columns, params):
+    if talib is not None:
+        return [talib.HT_TRENDLINE(columns[0])]
+    return _stream(stream.HT_TRENDLINE, columns, params, 1)
+
+
+class Spec(object):
+    # inputs: 用到的 bar 字段；defaults: 缺省参数；compute(columns, params) 返回各个输出；
+    # lookback(params): 第一个有效值之前的 bar 数；recursive(params): 是否依赖全部历史
+    def __init__(self, inputs, outputs, defaults, compute, lookback, recursive=lambda params: False):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.defaults = defaults
+        self.compute = compute
+        self.lookback = lookback
+        self.recursive = recursive
+
+
+INDICATORS = {
+    "ATR": Spec(("high", "low", "close"), ("atr",), {"timeperiod": 14, "mode": "wilder"},
+                lambda columns, params: [atr(*columns, **params)],
+                lambda params: params["timeperiod"], lambda params: params["mode"] == "wilder"),
+    "AR": Spec(("open", "high", "low"), ("ar",), {"timeperiod": 26},
+               lambda columns, params: [ar(*columns, **params)],
+               lambda params: params["timeperiod"] - 1),
+    "EMV": Spec(("high", "low", "volume"), ("emv",), {"timeperiod": 14},
+                lambda columns, params: [emv(*columns, **params)],
+                lambda params: params["timeperiod"]),
+    "RSI": Spec(("close",), ("rsi",), {"timeperiod": 14}, _rsi,
+                lambda params: params["timeperiod"], lambda params: True),
+    "KDJ": Spec(("high", "low", "close"), ("k", "d", "j"),
+                {"fastk_period": 9, "slowk_period": 3, "slowk_matype": 0, "slowd_period": 3, "slowd_matype": 0},
+                _kdj, lambda params: params["fastk_period"] + params["slowk_period"] + params["slowd_period"] - 3,
+                lambda params: params["slowk_matype"] != 0 or params["slowd_matype"] != 0),
+    "MACD": Spec(("close",), ("macd", "macdsignal", "macdhist"), {"fastperiod": 12, "slowperiod": 26, "signalperiod": 9},
+                 _macd, lambda params: max(params["fastperiod"], params["slowperiod"]) + params["signalperiod"] - 2,
+                 lambda params: True),
+    "BBANDS": Spec(("close",), ("upperband", "middleband", "lowerband"),
+                   {"timeperiod": 5, "nbdevup": 2.0, "nbdevdn": 2.0, "matype": 0}, _bbands,
+                   lambda params: params["timeperiod"] - 1, lambda params: params["matype"] != 0),
+    "KAMA": Spec(("close",), ("kama",), {"timeperiod": 30}, _kama,
+                 lambda params: params["timeperiod"], lambda params: True),
+    "HT_TRENDLINE": Spec(("close",), ("trendline",), {}, _ht_trendline,
+                         lambda params: stream.HT_TRENDLINE.LOOKBACK, lambda params: True),
+}
+
+
+def _feed(data_dir):
+    if data_dir not in _feeds:
+        _feeds[data_dir] = open_feed(data_dir)
+    return _feeds[data_dir]
+
+
+def _params(indicator, params):
+    if indicator not in INDICATORS:
+        raise ValueError("不支持的指标: %s，可选 %s" % (indicator, ", ".join(sorted(INDICATORS))))
+    spec = INDICATORS[indicator]
+    unknown = set(params or {}) - set(spec.defaults)
+    if unknown:
+        raise ValueError("%s 没有参数 %s" % (indicator, ", ".join(sorted(unknown))))
+    return spec, dict(spec.defaults, **(params or {}))
+
+
+def warmup_bars(indicator, params=None):
+    # 分段时每段向前多取的 bar 数
+    spec, params = _params(indicator, params)
+    lookback = spec.lookback(params)
+    return lookback + RECURSIVE_WARMUP if spec.recursive(params) else lookback
+
+
+def compute(bars, indicator, params=None, start=0, stop=None, warmup=None):
+    # 第 start 到 stop-1 根 bar 的指标值，从 start - warmup 开始算（warmup 为 None 时从第一根算起）；返回各个输出
+    spec, params = _params(indicator, params)
+    stop = len(bars) if stop is None else stop
+    first = 0 if warmup is None else max(0, start - warmup)
+    columns = [np.asarray(bars[field][first:stop], dtype=np.float64) for field in spec.inputs]
+    return [np.asarray(output[start - first:]) for output in spec.compute(columns, params)]
+
+
+def _shard(task):
+    data_dir, security, frequency, indicator, params, start, stop, warmup = task
+    bars = _feed(data_dir).bars(security, frequency)
+    return np.array(bars.timestamp[start:stop]), compute(bars, indicator, params, start, stop, warmup)
+
+
+def shards(data_dir, security, frequency, indicator, params=None, start_time=None, end_time=None,
+           workers=1, warmup=None, shard_bars=SHARD_BARS):
+    # 依次产生 (timestamp, [输出...])，区间为起始时间在 [start_time, end_time) 内的 bar
+    bars = _feed(data_dir).bars(security, frequency)
+    start = 0 if start_time is None else bars.search(parse_time(start_time), side="left")
+    stop = len(bars) if end_time is None else bars.search(parse_time(end_time), side="left")
+    count = max(stop - start, 0)
+    if workers is None or workers <= 1 or count <= shard_bars:
+        yield _shard((data_dir, security, frequency, indicator, params, start, stop, None))
+        return
+    if warmup is None:
+        warmup = warmup_bars(indicator, params)
+    pieces = max(workers, int(math.ceil(count / float(shard_bars))))
+    bounds = np.linspace(start, stop, pieces + 1).astype(int)
+    tasks = [(data_dir, security, frequency, indicator, params, int(a), int(b), warmup)
+             for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_shard, tasks):
+            yield result
+
+
+def write_text(out, timestamps, outputs, seconds, precision=12):
+    # "2017-09-01 00:30:00;4.45785714286"，时间为 bar 的结束时间；预热期的 nan 不写
+    fmt = "%%.%dg" % precision
+    valid = np.flatnonzero(~np.isnan(outputs[0]))
+    times = np.char.replace(np.datetime_as_string((timestamps[valid] + seconds).astype("datetime64[s]")), "T", " ")
+    columns = [output[valid].tolist() for output in outputs]
+    for start in range(0, len(valid), WRITE_CHUNK):
+        rows = zip(times[start:start + WRITE_CHUNK].tolist(), *[column[start:start + WRITE_CHUNK] for column in columns])
+        out.write("".join("%s;%s\n" % (row[0], ";".join(fmt % value for value in row[1:])) for row in rows))
+
+
+def export(data_dir, security, frequency, indicator, params=None, start_time=None, end_time=None,
+           out=sys.stdout, fmt="text", workers=1, warmup=None, precision=12):
+    # fmt="npy" 时 out 为文件路径，写成带 timestamp（bar 结束时间）和各个输出字段的结构化数组
+    if fmt not in FORMATS:
+        raise ValueError("不支持的导出格式: %s" % fmt)
+    spec, _ = _params(indicator, params)
+    seconds = FREQUENCY_SECONDS[frequency]
+    parts = shards(data_dir, security, frequency, indicator, params, start_time, end_time, workers, warmup)
+    if fmt == "text":
+        for timestamps, outputs in parts:
+            write_text(out, timestamps, outputs, seconds, precision)
+        return
+    parts = list(parts)
+    timestamps = np.concatenate([timestamps for timestamps, _ in parts]) if parts else np.empty(0, dtype=np.int64)
+    table = np.empty(len(timestamps), dtype=[("timestamp", np.int64)] + [(name, np.float64) for name in spec.outputs])
+    table["timestamp"] = timestamps + seconds
+    for k, name in enumerate(spec.outputs):
+        table[name] = np.concatenate([outputs[k] for _, outputs in parts]) if parts else []
+    np.save(out, table)
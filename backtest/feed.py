@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+# 本地行情数据源。目录结构：<data_dir>/<security>/<frequency>.csv
+# 缺少某个频率的文件时，用已有的更细频率数据聚合出来。
+# 大量数据请先转换成 bar 存储（见 store.py），open_feed 会自动识别。
+
+import os
+
+from .bars import load_csv, resample
+from .constants import FREQUENCIES, FREQUENCY_SECONDS
+
+
+class CsvFeed(object):
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self._cache = {}
+
+    def path(self, security, frequency):
+        return os.path.join(self.data_dir, security, "%s.csv" % frequency)
+
+    def bars(self, security, frequency):
+        key = (security, frequency)
+        if key not in self._cache:
+            self._cache[key] = self._load(security, frequency)
+        return self._cache[key]
+
+    def _load(self, security, frequency):
+        if os.path.exists(self.path(security, frequency)):
+            return load_csv(self.path(security, frequency))
+        seconds = FREQUENCY_SECONDS[frequency]
+        for finer in reversed(FREQUENCIES[:FREQUENCIES.index(frequency)]):
+            if seconds % FREQUENCY_SECONDS[finer] == 0 and os.path.exists(self.path(security, finer)):
+                return resample(self.bars(security, finer), frequency)
+        raise IOError("找不到 %s %s 的行情数据: %s" % (security, frequency, self.path(security, frequency)))
+
+
+def open_feed(path):
+    from .store import BarStore, is_store
+
+    if is_store(path):
+        return BarStore(path)
+    return CsvFeed(path)
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+# 指标。大写类名为流式指标，每根新 bar O(1) 更新，代替每根 bar 在整个历史窗口上重新计算；
+# 小写函数对整段历史数组一次性向量化计算。
+
+from .ar import AR, ar
+from .atr import ATR, atr, calc_atr, true_range
+from .batch import BatchIndicators, BatchMovingAverage, BatchRSI
+from .emv import EMV, emv
+from .ma import MovingAverage
+from .registry import Indicators
+from .stream import BBANDS, HT_TRENDLINE, KAMA, MACD, MAX, MIN, RSI, STOCH, RollingExtreme, RollingSum
+from .vector import rolling_max, rolling_min
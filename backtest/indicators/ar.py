@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+# AR（人气指标），与 wequant/arx 中的算法相同：
+#     ar = sum(high - open) / sum(open - low) * 100，求和范围为包含当根在内最近 timeperiod 根
+# 第一个有效值在下标 timeperiod-1。
+
+import math
+
+import numpy as np
+
+from .stream import NAN, RollingSum
+from .vector import rolling_sum
+
+
+def ar(open, high, low, timeperiod=26):
+    open = np.asarray(open, dtype=np.float64)
+    up = rolling_sum(np.asarray(high, dtype=np.float64) - open, int(timeperiod))
+    down = rolling_sum(open - np.asarray(low, dtype=np.float64), int(timeperiod))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return up / down * 100
+
+
+class AR(object):
+    # 增量 AR，每根 bar O(1)
+    inputs = ("open", "high", "low")
+
+    def __init__(self, timeperiod=26):
+        self.period = int(timeperiod)
+        self._up = RollingSum(timeperiod)
+        self._down = RollingSum(timeperiod)
+
+    def update(self, open, high, low):
+        up = self._up.update(high - open)
+        down = self._down.update(open - low)
+        if up != up or down != down:
+            return NAN
+        if down == 0:
+            return NAN if up == 0 else math.copysign(math.inf, up)
+        return up / down * 100
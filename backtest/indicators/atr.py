@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# ATR（真实波幅均值）。
+# mode="simple"：最近 timeperiod 个真实波幅的简单平均，与海龟脚本里的 calc_atr 一致；
+# mode="wilder"：Wilder 平滑，与 talib.ATR 一致。
+
+from collections import deque
+
+import numpy as np
+
+from .vector import linear_filter, rolling_sum
+
+NAN = float("nan")
+MODES = ("simple", "wilder")
+
+
+def true_range(high, low, close):
+    # 第一根 bar 没有前收盘价，为 nan（同 talib.TRANGE）
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    result = np.full(len(high), np.nan)
+    if len(high) > 1:
+        prev_close = close[:-1]
+        result[1:] = np.maximum(high[1:] - low[1:],
+                                np.maximum(high[1:] - prev_close, prev_close - low[1:]))
+    return result
+
+
+def atr(high, low, close, timeperiod=14, mode="wilder"):
+    # 整段历史一次算完，第一个有效值在下标 timeperiod
+    if mode not in MODES:
+        raise ValueError("不支持的 ATR 模式: %s" % mode)
+    period = int(timeperiod)
+    tr = true_range(high, low, close)
+    result = np.full(len(tr), np.nan)
+    if len(tr) <= period:
+        return result
+    if mode == "simple":
+        result[1:] = rolling_sum(tr[1:], period) / period
+        return result
+    seed = np.mean(tr[1:period + 1])
+    result[period] = seed
+    result[period + 1:] = linear_filter(tr[period + 1:], (period - 1.0) / period, 1.0 / period, seed)
+    return result
+
+
+def calc_atr(data):
+    # 海龟脚本中 calc_atr(hist) 的替代：hist 的全部真实波幅的平均值
+    high, low, close = np.asarray(data["high"]), np.asarray(data["low"]), np.asarray(data["close"])
+    return float(np.mean(true_range(high, low, close)[1:]))
+
+
+class ATR(object):
+    # 增量 ATR，每根 bar O(1)
+    inputs = ("high", "low", "close")
+
+    def __init__(self, timeperiod=14, mode="wilder"):
+        if mode not in MODES:
+            raise ValueError("不支持的 ATR 模式: %s" % mode)
+        self.period = int(timeperiod)
+        self.mode = mode
+        self._prev_close = None
+        self._window = deque()
+        self._total = 0.0
+        self._value = NAN
+
+    def update(self, high, low, close):
+        prev_close, self._prev_close = self._prev_close, close
+        if prev_close is None:
+            return NAN
+        tr = max(high - low, high - prev_close, prev_close - low)
+        period = self.period
+        if self._value == self._value and self.mode == "wilder":
+            self._value = (self._value * (period - 1) + tr) / period
+            return self._value
+        self._window.append(tr)
+        self._total += tr
+        if len(self._window) < period:
+            return NAN
+        self._value = self._total / period
+        self._total -= self._window.popleft()
+        return self._value
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+# 多标的批量指标：同一个策略同时回测 btc / ltc / eth 时，指标状态存成 (标的 × 窗口) 的二维数组，
+# 所有标的一起用 numpy 计算，策略通过 context.indicators.moving_average / RSI 访问，接口与单标的时相同。
+#
+# 逐根 bar 对几个标的做 numpy 运算比逐个标的用 Python 算还慢，所以这里按块提前算出后面 CHUNK 根 bar 的值，
+# 每根 bar 的指标只依赖当根及以前的数据，返回给策略的结果截止到当前 bar，不会看到未来。
+# 各标的已经算到同一根 bar 时（同一交易所的 bar 时间通常完全相同）放在一个二维数组里一起算。
+
+import numpy as np
+
+from .ma import RESYNC as MA_RESYNC
+from .registry import Indicators
+from .vector import linear_filter
+
+NAN = float("nan")
+# 每次提前计算的 bar 数
+CHUNK = 4096
+
+
+def _stack(columns, rows, start, stop):
+    return np.stack([columns[i][start:stop] for i in rows])
+
+
+def _run_length(flags, carry):
+    # 按行的 vector.run_length，carry 为每行上一块结束时的连续次数，块开头连续为 True 的部分接着累加
+    index = np.arange(flags.shape[1])
+    last = np.maximum.accumulate(np.where(flags, -1, index), axis=1)
+    return np.where(last < 0, index + 1 + np.reshape(carry, (-1, 1)), index - last)
+
+
+class BatchMovingAverage(object):
+    # 多个标的的 MovingAverage。滚动和按 cumsum 依次累加，与 MovingAverage 逐根相加的结果逐位一致
+    inputs = ("close",)
+
+    def __init__(self, closes, windows, lookback=0):
+        # closes: 每个标的的收盘价数组
+        self.closes = closes
+        self.windows = sorted(set(int(k) for k in windows))
+        self.lookback = int(lookback)
+        self.count = np.zeros(len(closes), dtype=np.int64)
+        self._column = dict((k, j) for j, k in enumerate(self.windows))
+        self._sums = np.zeros((len(closes), len(self.windows)))
+        # (标的 × 窗口 × bar)
+        shape = (len(closes), len(self.windows), max(len(c) for c in closes))
+        self._means = np.full(shape, np.nan)
+        # 截至每根 bar 连续满足 p[t] >= p[t-k]（MA(k) 不下降）/ p[t] <= p[t-k] 的次数，rising / falling 直接按下标读取
+        self._rising = np.zeros(shape, dtype=np.int64)
+        self._falling = np.zeros(shape, dtype=np.int64)
+
+    def extend(self, rows, stop):
+        # rows 中的标的已经算到同一根 bar，一起算到第 stop 根；到 RESYNC 的整数倍时按窗口重算滚动和
+        start = int(self.count[rows[0]])
+        while start < stop:
+            end = min(stop, (start // MA_RESYNC + 1) * MA_RESYNC)
+            self._extend(rows, start, end)
+            start = end
+        self.count[rows] = stop
+
+    def _extend(self, rows, start, stop):
+        closes = self.closes
+        index = np.arange(start, stop)
+        price = _stack(closes, rows, start, stop)
+        for j, k in enumerate(self.windows):
+            old = np.stack([closes[i][np.maximum(index - k, 0)] for i in rows])
+            change = price - np.where(index >= k, old, 0.0)
+            sums = np.cumsum(np.concatenate([self._sums[rows, j][:, None], change], axis=1), axis=1)[:, 1:]
+            if stop % MA_RESYNC == 0 and stop > k:
+                sums[:, -1] = [sum(closes[i][stop - k:stop][::-1]) for i in rows]
+            self._sums[rows, j] = sums[:, -1]
+            self._means[rows, j, start:stop] = np.where(index + 1 >= k, sums / k, np.nan)
+            valid = index >= k
+            for runs, ok in ((self._rising, valid & (price >= old)), (self._falling, valid & (price <= old))):
+                runs[rows, j, start:stop] = _run_length(ok, runs[rows, j, start - 1] if start else 0)
+
+    def lane(self, i, cursor):
+        return LaneMovingAverage(self, i, cursor)
+
+
+class LaneMovingAverage(object):
+    # 批量均线中一个标的截至第 cursor 根 bar 的状态，接口与 MovingAverage 相同
+    def __init__(self, batch, i, cursor):
+        self.windows = batch.windows
+        self.lookback = batch.lookback
+        self.count = cursor
+        self._close = batch.closes[i]
+        self._means = batch._means[i]
+        self._rising = batch._rising[i]
+        self._falling = batch._falling[i]
+        self._column = batch._column
+
+    def price(self, ago=0):
+        return float(self._close[self.count - 1 - ago])
+
+    def mean(self, k, ago=0):
+        # MA(k) 在 ago 根 bar 之前的值，数据不足时返回 nan
+        if ago > self.lookback:
+            raise ValueError("ago=%s 超过了 lookback=%s" % (ago, self.lookback))
+        if self.count - ago < k:
+            return NAN
+        return float(self._means[self._column[k], self.count - 1 - ago])
+
+    def rising(self, k, bars):
+        # 最近 bars 根都满足 p[t] >= p[t-k]，即 MA(k) 不下降
+        if bars <= 0:
+            return True
+        n = self.count
+        return n > k + bars - 1 and self._rising[self._column[k], n - 1] >= bars
+
+    def falling(self, k, bars):
+        if bars <= 0:
+            return True
+        n = self.count
+        return n > k + bars - 1 and self._falling[self._column[k], n - 1] >= bars
+
+
+class BatchRSI(object):
+    # 多个标的的 RSI。预热期与 stream.RSI 逐位一致，之后的 Wilder 平滑用 linear_filter，与 talib 的误差在 1e-10 以内
+    inputs = ("close",)
+
+    def __init__(self, closes, timeperiod=14):
+        self.closes = closes
+        self.period = int(timeperiod)
+        self.count = np.zeros(len(closes), dtype=np.int64)
+        self._gain = np.zeros(len(closes))
+        self._loss = np.zeros(len(closes))
+        self.output = np.full((len(closes), max(len(c) for c in closes)), np.nan)
+
+    def extend(self, rows, stop):
+        start = int(self.count[rows[0]])
+        period = self.period
+        self.count[rows] = stop
+        # 第 t 根 bar 是第 t 个涨跌幅，第 0 根没有
+        first = max(start, 1)
+        if first >= stop:
+            return
+        change = _stack(self.closes, rows, first, stop) - _stack(self.closes, rows, first - 1, stop - 1)
+        up, down = np.maximum(change, 0.0), np.maximum(-change, 0.0)
+        gain, loss = self._gain[rows], self._loss[rows]
+
+        # 前 period 个涨跌幅直接累加，然后取平均
+        warm = max(0, min(stop, period + 1) - first)
+        if warm:
+            gain = np.cumsum(np.concatenate([gain[:, None], up[:, :warm]], axis=1), axis=1)[:, -1]
+            loss = np.cumsum(np.concatenate([loss[:, None], down[:, :warm]], axis=1), axis=1)[:, -1]
+            if first + warm == period + 1:
+                gain, loss = gain / period, loss / period
+                self._write(rows, period, gain[:, None], loss[:, None])
+        if first + warm < stop:
+            decay = (period - 1.0) / period
+            gains = linear_filter(up[:, warm:], decay, 1.0 / period, gain)
+            losses = linear_filter(down[:, warm:], decay, 1.0 / period, loss)
+            self._write(rows, first + warm, gains, losses)
+            gain, loss = gains[:, -1], losses[:, -1]
+        self._gain[rows] = gain
+        self._loss[rows] = loss
+
+    def _write(self, rows, start, gains, losses):
+        total = gains + losses
+        with np.errstate(invalid="ignore", divide="ignore"):
+            value = np.where(np.abs(total) < 0.00000001, 0.0, 100.0 * (gains / total))
+        self.output[rows, start:start + value.shape[1]] = value
+
+
+class BatchIndicators(object):
+    # 多个标的共用的批量指标缓存，lane(i) 返回第 i 个标的的 context.indicators
+    def __init__(self, data, securities, cache=None):
+        self.data = data
+        self.securities = list(securities)
+        self.cache = cache
+        self._entries = {}
+        # 当前 bar 各频率下每个标的的 bar 数，所有标的共用同一个时钟，每根 bar 只查一次
+        self._cursors = {}
+        self._end = None
+
+    def lane(self, i):
+        return LaneIndicators(self, i)
+
+    def cursors(self, frequency):
+        end = self.data.clock.end
+        if end != self._end:
+            self._cursors = {}
+            self._end = end
+        if frequency not in self._cursors:
+            self._cursors[frequency] = [self.data.cursor(security, frequency) for security in self.securities]
+        return self._cursors[frequency]
+
+    def advance(self, factory, frequency, params):
+        # 保证每个标的都算到了当前 bar，返回指标对象和每个标的当前的 bar 数
+        frequency = frequency or self.data.frequency
+        key = (factory.__name__, frequency, tuple(sorted(params.items())))
+        indicator = self._entries.get(key)
+        if indicator is None:
+            closes = [self.data.bars(security, frequency).close for security in self.securities]
+            indicator = factory(closes, **params)
+            self._entries[key] = indicator
+        cursors = self.cursors(frequency)
+        groups = {}
+        for i, (count, cursor) in enumerate(zip(indicator.count.tolist(), cursors)):
+            if count < cursor:
+                stop = min(len(indicator.closes[i]), cursor + CHUNK)
+                groups.setdefault((count, stop), []).append(i)
+        for (count, stop), rows in groups.items():
+            indicator.extend(rows, stop)
+        return indicator, cursors
+
+
+class LaneIndicators(Indicators):
+    # 单个标的的 context.indicators：本标的的均线和 RSI 走批量计算，其他指标和其他标的按单标的方式计算
+    def __init__(self, batch, i):
+        Indicators.__init__(self, batch.data, batch.cache)
+        self.batch = batch
+        self.i = i
+        self.security = batch.securities[i]
+
+    def moving_average(self, security, windows, lookback=0, frequency=None):
+        if security != self.security:
+            return Indicators.moving_average(self, security, windows, lookback, frequency)
+        params = {"windows": tuple(sorted(set(int(k) for k in windows))), "lookback": lookback}
+        indicator, cursors = self.batch.advance(BatchMovingAverage, frequency, params)
+        return indicator.lane(self.i, cursors[self.i])
+
+    def RSI(self, security, timeperiod=14, frequency=None):
+        if security != self.security:
+            return Indicators.RSI(self, security, timeperiod, frequency)
+        indicator, cursors = self.batch.advance(BatchRSI, frequency, {"timeperiod": timeperiod})
+        view = indicator.output[self.i, :cursors[self.i]]
+        view.flags.writeable = False
+        return view
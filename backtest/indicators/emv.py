@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+# EMV（简易波动指标），与 wequant/emv 中用 pandas 的算法相同：
+#     mid = (high + low) / 2
+#     em = (mid - 前一根的 mid) * (high - low) / volume
+#     emv = 最近 timeperiod 个 em 的和
+# 第一根 bar 没有前一根的 mid，第一个有效值在下标 timeperiod。
+# 成交量为 0 的 bar 的 em 为 nan / inf，包含它的 timeperiod 个窗口的 emv 都为 nan（同 pandas 的 rolling().sum()）。
+
+import math
+
+import numpy as np
+
+from .stream import NAN, RollingSum
+from .vector import rolling_sum
+
+
+def ease_of_movement(high, low, volume):
+    # 每根 bar 的 em，第一根为 nan；成交量为 0 时为 nan / inf（同 pandas 的除法）
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    mid = (high + low) / 2
+    result = np.full(len(mid), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[1:] = (mid[1:] - mid[:-1]) * (high[1:] - low[1:]) / volume[1:]
+    return result
+
+
+def emv(high, low, volume, timeperiod=14):
+    return rolling_sum(ease_of_movement(high, low, volume), int(timeperiod))
+
+
+class EMV(object):
+    # 增量 EMV，每根 bar O(1)
+    inputs = ("high", "low", "volume")
+
+    def __init__(self, timeperiod=14):
+        self.period = int(timeperiod)
+        self._prev_mid = None
+        self._sum = RollingSum(timeperiod)
+
+    def update(self, high, low, volume):
+        mid = (high + low) / 2
+        prev_mid, self._prev_mid = self._prev_mid, mid
+        if prev_mid is None:
+            return NAN
+        change = (mid - prev_mid) * (high - low)
+        if volume != 0:
+            em = change / volume
+        else:
+            em = NAN if change == 0 or change != change else math.copysign(math.inf, change)
+        return self._sum.update(em)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# 增量均线：每根 bar O(1) 更新，供 5/10/30/60 均线叠加类策略（rappid_river/ltc_v2.py 等）使用。
+#
+# MA(k) 从 t-1 到 t 的变化是 (p[t] - p[t-k]) / k，所以 "MA(k) 连续 c 根不下降"
+# 等价于最近 c 根都满足 p[t] >= p[t-k]，用一个连续计数就能 O(1) 判断，不必比较均值。
+
+# 每隔这么多根 bar 用窗口内的价格重算一次滚动和，消除浮点累计误差
+RESYNC = 100000
+
+
+class MovingAverage(object):
+    inputs = ("close",)
+
+    def __init__(self, windows, lookback=0):
+        # windows: 需要的均线周期；lookback: mean(k, ago) 中 ago 的最大值
+        self.windows = sorted(set(int(k) for k in windows))
+        self.lookback = int(lookback)
+        self.count = 0
+        self._size = self.windows[-1] + 1
+        self._prices = [0.0] * self._size
+        self._sums = dict((k, 0.0) for k in self.windows)
+        self._means = dict((k, [float("nan")] * (self.lookback + 1)) for k in self.windows)
+        self._rising = dict((k, 0) for k in self.windows)
+        self._falling = dict((k, 0) for k in self.windows)
+
+    def price(self, ago=0):
+        return self._prices[(self.count - 1 - ago) % self._size]
+
+    def update(self, price):
+        price = float(price)
+        n = self.count
+        self._prices[n % self._size] = price
+        self.count = n + 1
+        slot = n % (self.lookback + 1)
+        resync = self.count % RESYNC == 0
+        for k in self.windows:
+            if n >= k:
+                old = self._prices[(n - k) % self._size]
+                self._sums[k] += price - old
+                if price >= old:
+                    self._rising[k] += 1
+                else:
+                    self._rising[k] = 0
+                if price <= old:
+                    self._falling[k] += 1
+                else:
+                    self._falling[k] = 0
+            else:
+                self._sums[k] += price
+            if resync and n >= k:
+                self._sums[k] = sum(self.price(i) for i in range(k))
+            self._means[k][slot] = self._sums[k] / k if self.count >= k else float("nan")
+
+    def extend(self, prices):
+        for price in prices:
+            self.update(price)
+
+    def mean(self, k, ago=0):
+        # MA(k) 在 ago 根 bar 之前的值，数据不足时返回 nan
+        if ago > self.lookback:
+            raise ValueError("ago=%s 超过了 lookback=%s" % (ago, self.lookback))
+        if self.count - ago < k:
+            return float("nan")
+        return self._means[k][(self.count - 1 - ago) % (self.lookback + 1)]
+
+    def rising(self, k, bars):
+        # MA(k) 最近 bars 次比较都不下降，即 ma_is_upping(context, close, bars, k)
+        if bars <= 0:
+            return True
+        return self.count > k + bars - 1 and self._rising[k] >= bars
+
+    def falling(self, k, bars):
+        # MA(k) 最近 bars 次比较都不上升，即 ma_is_downing(context, close, bars, k)
+        if bars <= 0:
+            return True
+        return self.count > k + bars - 1 and self._falling[k] >= bars
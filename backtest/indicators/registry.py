@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# context.indicators：按 (指标, 参数, security, frequency) 缓存流式指标。
+# 每次访问时只把指标推进到当前 bar（没有看过的 bar 逐根 update），所以每根 bar 的开销是 O(1)；
+# 第一次访问会从该频率的第一根 bar 开始预热，结果与对完整历史调用 talib 一致。
+# 设置了磁盘缓存（cache.py）时第一次访问就算完整段历史并保存，之后的回测直接读出。
+#
+#     K, D = context.indicators.STOCH(context.security, fastk_period=9, slowk_period=3, slowd_period=3)
+#     rsi = context.indicators.RSI(context.security, timeperiod=21)[-1]
+
+import numpy as np
+
+from .. import levels, prefix, rangeindex
+from . import stream, vector
+from .ar import AR
+from .atr import ATR
+from .emv import EMV
+from .ma import MovingAverage
+
+
+class _Entry(object):
+    def __init__(self, indicator, bars, outputs):
+        self.indicator = indicator
+        self.inputs = [bars[field] for field in indicator.inputs]
+        self.consumed = 0
+        # outputs 为 0 时只维护指标对象本身，不保存输出序列
+        self.outputs = [np.full(len(bars), np.nan) for _ in range(outputs)]
+
+    def advance(self, stop):
+        indicator, inputs, outputs = self.indicator, self.inputs, self.outputs
+        for i in range(self.consumed, stop):
+            value = indicator.update(*[column[i] for column in inputs])
+            if len(outputs) == 1:
+                outputs[0][i] = value
+            else:
+                for output, v in zip(outputs, value or ()):
+                    output[i] = v
+        self.consumed = max(self.consumed, stop)
+
+
+class Indicators(object):
+    def __init__(self, data, cache=None):
+        self.data = data
+        # 指标的磁盘缓存（见 cache.py），为 None 时不使用
+        self.cache = cache
+        self._entries = {}
+        # 价位表上一次返回的视图，截止位置没变（如日线价位在一天之内）时直接复用
+        self._views = {}
+
+    def _advance(self, factory, outputs, security, frequency, params):
+        frequency = frequency or self.data.frequency
+        key = (factory.__name__, security, frequency, tuple(sorted(params.items())))
+        entry = self._entries.get(key)
+        if entry is None:
+            bars = self.data.bars(security, frequency)
+            entry = _Entry(factory(**params), bars, outputs)
+            if self.cache is not None and outputs:
+                # 整段历史一次算完（或从缓存读出），之后每根 bar 不用再推进
+                def build():
+                    entry.advance(len(bars))
+                    return entry.outputs
+                entry.outputs = self.cache.get(security, frequency, bars, factory, params, outputs, build)
+                entry.consumed = len(bars)
+            self._entries[key] = entry
+        stop = self.data.cursor(security, frequency)
+        entry.advance(stop)
+        return entry, stop
+
+    def _series(self, factory, outputs, security, frequency, params):
+        entry, stop = self._advance(factory, outputs, security, frequency, params)
+        views = []
+        for output in entry.outputs:
+            view = output[:stop]
+            view.flags.writeable = False
+            views.append(view)
+        return views[0] if outputs == 1 else tuple(views)
+
+    def moving_average(self, security, windows, lookback=0, frequency=None):
+        # 返回推进到当前 bar 的 MovingAverage 对象
+        params = {"windows": tuple(windows), "lookback": lookback}
+        return self._advance(MovingAverage, 0, security, frequency, params)[0].indicator
+
+    def ATR(self, security, timeperiod=14, mode="wilder", frequency=None):
+        return self._series(ATR, 1, security, frequency, {"timeperiod": timeperiod, "mode": mode})
+
+    def EMV(self, security, timeperiod=14, frequency=None):
+        return self._series(EMV, 1, security, frequency, {"timeperiod": timeperiod})
+
+    def AR(self, security, timeperiod=26, frequency=None):
+        return self._series(AR, 1, security, frequency, {"timeperiod": timeperiod})
+
+    def RSI(self, security, timeperiod=14, frequency=None):
+        return self._series(stream.RSI, 1, security, frequency, {"timeperiod": timeperiod})
+
+    def MACD(self, security, fastperiod=12, slowperiod=26, signalperiod=9, frequency=None):
+        params = {"fastperiod": fastperiod, "slowperiod": slowperiod, "signalperiod": signalperiod}
+        return self._series(stream.MACD, 3, security, frequency, params)
+
+    def BBANDS(self, security, timeperiod=5, nbdevup=2.0, nbdevdn=2.0, matype=0, frequency=None):
+        params = {"timeperiod": timeperiod, "nbdevup": nbdevup, "nbdevdn": nbdevdn, "matype": matype}
+        return self._series(stream.BBANDS, 3, security, frequency, params)
+
+    def MAX(self, security, timeperiod=30, field="close", frequency=None):
+        return self._series(stream.MAX, 1, security, frequency, {"timeperiod": timeperiod, "field": field})
+
+    def MIN(self, security, timeperiod=30, field="close", frequency=None):
+        return self._series(stream.MIN, 1, security, frequency, {"timeperiod": timeperiod, "field": field})
+
+    def STOCH(self, security, fastk_period=5, slowk_period=3, slowk_matype=0, slowd_period=3, slowd_matype=0,
+              frequency=None):
+        params = {"fastk_period": fastk_period, "slowk_period": slowk_period, "slowk_matype": slowk_matype,
+                  "slowd_period": slowd_period, "slowd_matype": slowd_matype}
+        return self._series(stream.STOCH, 2, security, frequency, params)
+
+    def KAMA(self, security, timeperiod=30, frequency=None):
+        return self._series(stream.KAMA, 1, security, frequency, {"timeperiod": timeperiod})
+
+    def HT_TRENDLINE(self, security, frequency=None):
+        return self._series(stream.HT_TRENDLINE, 1, security, frequency, {})
+
+    def range_index(self, security, field="high", maximum=True, frequency=None):
+        # 区间极值的稀疏表，只能查询到当前 bar 为止；window(k)[-1] 为当前 bar 之前 k 根的极值
+        frequency = frequency or self.data.frequency
+        table = rangeindex.range_table(self.data.feed, security, frequency, field, maximum)
+        return table.until(self.data.cursor(security, frequency))
+
+    def prefix_sums(self, security, field="close", frequency=None):
+        # 前缀和表，截止到当前 bar；last_mean(k) 为包含当前 bar 在内最近 k 根的均值
+        frequency = frequency or self.data.frequency
+        table = prefix.prefix_sums(self.data.feed, security, frequency, field)
+        return table.until(self.data.cursor(security, frequency))
+
+    def ma_trend(self, security, window, bars, rising=True, frequency=None):
+        # 整段历史的 "MA(window) 连续 bars 次不下降 / 不上升" 布尔数组，截止到当前 bar；[-1] 为当前 bar
+        params = {"window": window, "bars": bars, "rising": rising}
+        return self._levels(security, frequency, "ma_trend", params,
+                            lambda b: [vector.ma_trend(b.close, window, bars, rising)])[0]
+
+    def _levels(self, security, frequency, name, params, build):
+        # levels.py 中预先算好的整段价位表，截止到当前 bar
+        frequency = frequency or self.data.frequency
+        stop = self.data.cursor(security, frequency)
+        key = (name, security, frequency, tuple(sorted(params.items())))
+        cached = self._views.get(key)
+        if cached is not None and cached[0] == stop:
+            return cached[1]
+        bars = self.data.bars(security, frequency)
+        values = levels.table(bars, name, params, lambda: build(bars))
+        views = []
+        for value in values:
+            view = value[:stop]
+            view.flags.writeable = False
+            views.append(view)
+        self._views[key] = (stop, views)
+        return views
+
+    def RBREAKER(self, security):
+        # R-Breaker 的六个价位和中心点，按日线下标；[-1] 为用上一根走完的日线算出的价位
+        def build(bars):
+            table = levels.rbreaker(bars.high, bars.low, bars.close)
+            return [table[name] for name in levels.RBREAKER_LEVELS]
+        return dict(zip(levels.RBREAKER_LEVELS, self._levels(security, "1d", "rbreaker", {}, build)))
+
+    def DUAL_THRUST(self, security, window_size, K1, K2, frequency=None):
+        # 返回 (上轨, 下轨)；[-1] 为当前 bar 的开盘价加减 K1 / K2 倍的前 window_size 根的 range
+        params = {"window_size": window_size, "K1": K1, "K2": K2}
+        frequency = frequency or self.data.frequency
+        return tuple(self._levels(security, frequency, "dual_thrust", params,
+                                  lambda bars: self._dual_thrust(security, frequency, bars, window_size, K1, K2)))
+
+    def _dual_thrust(self, security, frequency, bars, window_size, K1, K2):
+        # range 只和 window_size 有关，不同的 K1 / K2 共用；四个极值从稀疏表中取，不同的 window_size 共用同一张表
+        def build():
+            feed = self.data.feed
+            hh, hc = [rangeindex.range_table(feed, security, frequency, field, True).window(window_size)
+                      for field in ("high", "close")]
+            lc, ll = [rangeindex.range_table(feed, security, frequency, field, False).window(window_size)
+                      for field in ("close", "low")]
+            return levels.dual_thrust_spread(hh, hc, lc, ll)
+        price_range = levels.table(bars, "dual_thrust_range", {"window_size": window_size}, build)
+        return levels.dual_thrust_bounds(bars.open, price_range, K1, K2)
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+
+# talib 常用指标的增量版本：每根新 bar 调用一次 update，O(1) 更新。
+# 计算顺序和初始化方式照搬 talib，对同一段完整历史的输出与 talib 一致（浮点误差以内）。
+# 预热期内输出 nan，和 talib 的 lookback 对齐。
+
+import math
+from collections import deque
+
+NAN = float("nan")
+# 滚动和每隔这么多根 bar 按窗口重算一次，消除浮点累计误差
+RESYNC = 10000
+
+
+def is_zero(value):
+    # talib 的 TA_IS_ZERO
+    return -0.00000001 < value < 0.00000001
+
+
+class SMA(object):
+    def __init__(self, timeperiod):
+        self.period = int(timeperiod)
+        self._window = deque()
+        self._total = 0.0
+
+    def update(self, value):
+        self._window.append(value)
+        self._total += value
+        if len(self._window) < self.period:
+            return NAN
+        result = self._total / self.period
+        self._total -= self._window.popleft()
+        return result
+
+
+class RollingSum(object):
+    # 最近 period 个值的滚动和，前 period-1 个为 nan。窗口中有 nan / inf 时为 nan（同 pandas 的 rolling().sum()），
+    # 这些值不计入滚动和，移出窗口后恢复正常
+    def __init__(self, period):
+        self.period = int(period)
+        self._window = deque()
+        self._total = 0.0
+        self._invalid = 0
+        self._count = 0
+
+    def update(self, value):
+        window = self._window
+        window.append(value)
+        self._count += 1
+        if math.isfinite(value):
+            self._total += value
+        else:
+            self._invalid += 1
+        if self._count % RESYNC == 0:
+            self._total = math.fsum(v for v in window if math.isfinite(v))
+        if len(window) < self.period:
+            return NAN
+        result = NAN if self._invalid else self._total
+        old = window.popleft()
+        if math.isfinite(old):
+            self._total -= old
+        else:
+            self._invalid -= 1
+        return result
+
+
+class EMA(object):
+    # talib 的 EMA：用前 timeperiod 个值的简单均值作为初值
+    def __init__(self, timeperiod):
+        self.period = int(timeperiod)
+        self.k = 2.0 / (self.period + 1)
+        self._seed = 0.0
+        self._count = 0
+        self._value = NAN
+
+    def update(self, value):
+        self._count += 1
+        if self._count < self.period:
+            self._seed += value
+            return NAN
+        if self._count == self.period:
+            self._value = (self._seed + value) / self.period
+        else:
+            self._value = (value - self._value) * self.k + self._value
+        return self._value
+
+
+def moving_average(matype, timeperiod):
+    # talib.MA_Type: 0 = SMA, 1 = EMA
+    if int(matype) == 0:
+        return SMA(timeperiod)
+    if int(matype) == 1:
+        return EMA(timeperiod)
+    raise ValueError("不支持的 matype: %s" % matype)
+
+
+class RSI(object):
+    inputs = ("close",)
+
+    def __init__(self, timeperiod=14):
+        self.period = int(timeperiod)
+        self._prev = None
+        self._count = 0
+        self._gain = 0.0
+        self._loss = 0.0
+
+    def update(self, close):
+        if self._prev is None:
+            self._prev = close
+            return NAN
+        change = close - self._prev
+        self._prev = close
+        self._count += 1
+        period = self.period
+        if self._count <= period:
+            if change < 0:
+                self._loss -= change
+            else:
+                self._gain += change
+            if self._count < period:
+                return NAN
+            self._loss /= period
+            self._gain /= period
+        else:
+            self._loss *= (period - 1)
+            self._gain *= (period - 1)
+            if change < 0:
+                self._loss -= change
+            else:
+                self._gain += change
+            self._loss /= period
+            self._gain /= period
+        total = self._gain + self._loss
+        return 0.0 if is_zero(total) else 100.0 * (self._gain / total)
+
+
+class MACD(object):
+    # 输出 (macd, macdsignal, macdhist)
+    inputs = ("close",)
+
+    def __init__(self, fastperiod=12, slowperiod=26, signalperiod=9):
+        fastperiod, slowperiod = int(fastperiod), int(slowperiod)
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        self.fastperiod = fastperiod
+        self.slowperiod = slowperiod
+        self._fast = EMA(fastperiod)
+        self._slow = EMA(slowperiod)
+        self._signal = EMA(signalperiod)
+        self._count = 0
+
+    def update(self, close):
+        self._count += 1
+        slow = self._slow.update(close)
+        # talib 里快线和慢线在同一根 bar 出值，快线只用最后 fastperiod 个值初始化
+        if self._count > self.slowperiod - self.fastperiod:
+            fast = self._fast.update(close)
+        else:
+            fast = NAN
+        if self._count < self.slowperiod:
+            return NAN, NAN, NAN
+        macd = fast - slow
+        signal = self._signal.update(macd)
+        if signal != signal:
+            return NAN, NAN, NAN
+        return macd, signal, macd - signal
+
+
+class BBANDS(object):
+    # 输出 (upperband, middleband, lowerband)，标准差为总体标准差
+    inputs = ("close",)
+
+    def __init__(self, timeperiod=5, nbdevup=2.0, nbdevdn=2.0, matype=0):
+        if int(matype) != 0:
+            raise ValueError("BBANDS 目前只支持 matype=0 (SMA)")
+        self.period = int(timeperiod)
+        self.nbdevup = float(nbdevup)
+        self.nbdevdn = float(nbdevdn)
+        self._window = deque()
+        self._total = 0.0
+        self._total2 = 0.0
+        self._count = 0
+
+    def update(self, close):
+        self._window.append(close)
+        self._total += close
+        self._total2 += close * close
+        self._count += 1
+        if self._count % RESYNC == 0:
+            self._total = math.fsum(self._window)
+            self._total2 = math.fsum(x * x for x in self._window)
+        if len(self._window) < self.period:
+            return NAN, NAN, NAN
+        middle = self._total / self.period
+        variance = self._total2 / self.period - middle * middle
+        stddev = math.sqrt(variance) if variance > 0 and not is_zero(variance) else 0.0
+        old = self._window.popleft()
+        self._total -= old
+        self._total2 -= old * old
+        return middle + self.nbdevup * stddev, middle, middle - self.nbdevdn * stddev
+
+
+class RollingExtreme(object):
+    # 单调队列维护最近 period 个值的最大（或最小）值，均摊 O(1)
+    def __init__(self, period, maximum=True):
+        self.period = int(period)
+        self.maximum = maximum
+        self._queue = deque()
+        self._count = 0
+
+    def update(self, value):
+        queue = self._queue
+        if self.maximum:
+            while queue and queue[-1][1] <= value:
+                queue.pop()
+        else:
+            while queue and queue[-1][1] >= value:
+                queue.pop()
+        queue.append((self._count, value))
+        if queue[0][0] <= self._count - self.period:
+            queue.popleft()
+        self._count += 1
+        if self._count < self.period:
+            return NAN
+        return queue[0][1]
+
+
+class MAX(RollingExtreme):
+    # talib.MAX，field 为使用的价格字段，唐奇安上轨用 field="high"
+    def __init__(self, timeperiod=30, field="close"):
+        RollingExtreme.__init__(self, timeperiod, maximum=True)
+        self.inputs = (field,)
+
+
+class MIN(RollingExtreme):
+    def __init__(self, timeperiod=30, field="close"):
+        RollingExtreme.__init__(self, timeperiod, maximum=False)
+        self.inputs = (field,)
+
+
+class STOCH(object):
+    # 输出 (slowk, slowd)
+    inputs = ("high", "low", "close")
+
+    def __init__(self, fastk_period=5, slowk_period=3, slowk_matype=0, slowd_period=3, slowd_matype=0):
+        self._highest = RollingExtreme(fastk_period, maximum=True)
+        self._lowest = RollingExtreme(fastk_period, maximum=False)
+        self._slowk = moving_average(slowk_matype, slowk_period)
+        self._slowd = moving_average(slowd_matype, slowd_period)
+
+    def update(self, high, low, close):
+        highest = self._highest.update(high)
+        lowest = self._lowest.update(low)
+        if highest != highest:
+            return NAN, NAN
+        diff = (highest - lowest) / 100.0
+        fastk = (close - lowest) / diff if diff != 0 else 0.0
+        slowk = self._slowk.update(fastk)
+        if slowk != slowk:
+            return NAN, NAN
+        slowd = self._slowd.update(slowk)
+        if slowd != slowd:
+            return NAN, NAN
+        return slowk, slowd
+
+
+class KAMA(object):
+    inputs = ("close",)
+    FAST = 2.0 / (2 + 1)
+    SLOW = 2.0 / (30 + 1)
+
+    def __init__(self, timeperiod=30):
+        self.period = int(timeperiod)
+        self._window = deque()
+        self._roc = 0.0
+        self._trailing = NAN
+        self._value = NAN
+
+    def update(self, close):
+        window = self._window
+        window.append(close)
+        if len(window) > 1:
+            self._roc += abs(close - window[-2])
+        if len(window) <= self.period:
+            return NAN
+        trailing = window.popleft()
+        if self._value != self._value:
+            # 第一次出值：以前一根收盘价作为初值
+            self._value = window[-2]
+        else:
+            self._roc -= abs(self._trailing - trailing)
+        self._trailing = trailing
+        change = close - trailing
+        if self._roc <= change or is_zero(self._roc):
+            ratio = 1.0
+        else:
+            ratio = abs(change / self._roc)
+        constant = ratio * (self.FAST - self.SLOW) + self.SLOW
+        constant *= constant
+        self._value = (close - self._value) * constant + self._value
+        return self._value
+
+
+class _Hilbert(object):
+    # talib ta_utility.h 中 DO_HILBERT_ODD / DO_HILBERT_EVEN 的状态
+    A = 0.0962
+    B = 0.5769
+
+    def __init__(self):
+        self.buffer = {0: [0.0] * 3, 1: [0.0] * 3}
+        self.prev = {0: 0.0, 1: 0.0}
+        self.prev_input = {0: 0.0, 1: 0.0}
+
+    def transform(self, value, parity, index, adjusted_prev_period):
+        temp = self.A * value
+        result = -self.buffer[parity][index]
+        self.buffer[parity][index] = temp
+        result += temp
+        result -= self.prev[parity]
+        self.prev[parity] = self.B * self.prev_input[parity]
+        result += self.prev[parity]
+        self.prev_input[parity] = value
+        return result * adjusted_prev_period
+
+
+class HT_TRENDLINE(object):
+    # 希尔伯特变换瞬时趋势线，lookback 为 63。趋势线需要对最近至多 50 根收盘价求均值，
+    # 每根 bar 的开销有固定上限，与历史长度无关
+    inputs = ("close",)
+    LOOKBACK = 63
+    RAD2DEG = 45.0 / math.atan(1)
+
+    def __init__(self):
+        self._count = 0
+        self._prices = deque(maxlen=50)
+        self._wma_trailing = deque()
+        self._wma_sub = 0.0
+        self._wma_sum = 0.0
+        self._wma_trailing_value = 0.0
+        self._hilbert_index = 0
+        self._detrender = _Hilbert()
+        self._q1 = _Hilbert()
+        self._ji = _Hilbert()
+        self._jq = _Hilbert()
+        self._period = 0.0
+        self._smooth_period = 0.0
+        self._prev_i2 = self._prev_q2 = 0.0
+        self._re = self._im = 0.0
+        self._i1_odd_prev3 = self._i1_even_prev3 = 0.0
+        self._i1_odd_prev2 = self._i1_even_prev2 = 0.0
+        self._itrend = [0.0, 0.0, 0.0]
+
+    def _price_wma(self, price):
+        self._wma_sub += price
+        self._wma_sub -= self._wma_trailing_value
+        self._wma_sum += price * 4.0
+        self._wma_trailing_value = self._wma_trailing.popleft()
+        smoothed = self._wma_sum * 0.1
+        self._wma_sum -= self._wma_sub
+        return smoothed
+
+    def update(self, close):
+        today = self._count
+        self._count += 1
+        self._prices.append(close)
+        self._wma_trailing.append(close)
+        if today < 3:
+            self._wma_sub += close
+            self._wma_sum += close * (today + 1)
+            return NAN
+        if today < 37:
+            self._price_wma(close)
+            return NAN
+
+        adjusted = 0.075 * self._period + 0.54
+        smoothed = self._price_wma(close)
+        index = self._hilbert_index
+        if today % 2 == 0:
+            detrender = self._detrender.transform(smoothed, 0, index, adjusted)
+            q1 = self._q1.transform(detrender, 0, index, adjusted)
+            ji = self._ji.transform(self._i1_even_prev3, 0, index, adjusted)
+            jq = self._jq.transform(q1, 0, index, adjusted)
+            self._hilbert_index = (index + 1) % 3
+            q2 = 0.2 * (q1 + ji) + 0.8 * self._prev_q2
+            i2 = 0.2 * (self._i1_even_prev3 - jq) + 0.8 * self._prev_i2
+            self._i1_odd_prev3 = self._i1_odd_prev2
+            self._i1_odd_prev2 = detrender
+        else:
+            detrender = self._detrender.transform(smoothed, 1, index, adjusted)
+            q1 = self._q1.transform(detrender, 1, index, adjusted)
+            ji = self._ji.transform(self._i1_odd_prev3, 1, index, adjusted)
+            jq = self._jq.transform(q1, 1, index, adjusted)
+            q2 = 0.2 * (q1 + ji) + 0.8 * self._prev_q2
+            i2 = 0.2 * (self._i1_odd_prev3 - jq) + 0.8 * self._prev_i2
+            self._i1_even_prev3 = self._i1_even_prev2
+            self._i1_even_prev2 = detrender
+
+        self._re = 0.2 * (i2 * self._prev_i2 + q2 * self._prev_q2) + 0.8 * self._re
+        self._im = 0.2 * (i2 * self._prev_q2 - q2 * self._prev_i2) + 0.8 * self._im
+        self._prev_q2 = q2
+        self._prev_i2 = i2
+        previous = self._period
+        period = previous
+        if self._im != 0.0 and self._re != 0.0:
+            period = 360.0 / (math.atan(self._im / self._re) * self.RAD2DEG)
+        period = min(period, 1.5 * previous)
+        period = max(period, 0.67 * previous)
+        period = min(max(period, 6), 50)
+        self._period = 0.2 * period + 0.8 * previous
+        self._smooth_period = 0.33 * self._period + 0.67 * self._smooth_period
+
+        dc_period = int(self._smooth_period + 0.5)
+        total = 0.0
+        for i in range(1, dc_period + 1):
+            total += self._prices[-i]
+        if dc_period > 0:
+            total /= dc_period
+        itrend = self._itrend
+        trendline = (4.0 * total + 3.0 * itrend[0] + 2.0 * itrend[1] + itrend[2]) / 10.0
+        itrend[2], itrend[1], itrend[0] = itrend[1], itrend[0], total
+        if today < self.LOOKBACK:
+            return NAN
+        return trendline
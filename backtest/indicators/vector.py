@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# 整段历史一次性计算指标时用到的 numpy 工具函数。
+
+import math
+
+import numpy as np
+
+# 分块计算递推时，块内权重的最大跨度，保证 float64 精度
+_MAX_SCALE = 1e10
+
+
+def linear_filter(values, decay, gain, initial=0.0):
+    # y[t] = decay * y[t-1] + gain * x[t]，y[-1] = initial。
+    # Wilder 平滑、EMA 都是这种递推；按块展开成 cumsum，块之间只传递一个状态值。
+    # values 为二维时每一行（如每个标的）各自递推，initial 可以是每行一个初值
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty_like(values)
+    if decay == 0:
+        np.multiply(values, gain, out=result)
+        return result
+    block = values.shape[-1]
+    if decay < 1:
+        block = max(1, min(block, int(math.log(_MAX_SCALE) / -math.log(decay))))
+    steps = np.arange(block, dtype=np.float64)
+    weights = decay ** -steps
+    powers = decay ** (steps + 1)
+    state = np.broadcast_to(np.asarray(initial, dtype=np.float64), values.shape[:-1])
+    for start in range(0, values.shape[-1], block):
+        chunk = values[..., start:start + block]
+        m = chunk.shape[-1]
+        partial = np.cumsum(chunk * weights[:m], axis=-1) * (gain / weights[:m])
+        result[..., start:start + m] = powers[:m] * state[..., None] + partial
+        state = result[..., start + m - 1]
+    return result
+
+
+def rolling_sum(values, window):
+    # 长度为 n 的滚动和，前 window-1 个为 nan；窗口中有 nan / inf 时为 nan（同 pandas 的 rolling().sum()）
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if window <= len(values):
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        with np.errstate(invalid="ignore"):
+            result[window - 1:] = windows.sum(axis=1)
+        invalid = np.r_[0, np.cumsum(~np.isfinite(values))]
+        result[window - 1:][invalid[window:] - invalid[:-window] > 0] = np.nan
+    return result
+
+
+def run_length(flags):
+    # [t] 为截至第 t 根连续为 True 的个数
+    flags = np.asarray(flags, dtype=bool)
+    index = np.arange(len(flags))
+    last = np.maximum.accumulate(np.where(flags, -1, index))
+    return index - last
+
+
+def ma_trend(values, window, bars, rising=True):
+    # [t]：MA(window) 截至第 t 根连续 bars 次不下降（rising=False 时不上升），与 MovingAverage.rising / falling 相同。
+    # MA 的变化是 (p[t] - p[t-window]) / window，只比较价格，再按连续计数判断
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if bars <= 0:
+        return np.ones(n, dtype=bool)
+    ok = np.zeros(n, dtype=bool)
+    if window < n:
+        if rising:
+            ok[window:] = values[window:] >= values[:-window]
+        else:
+            ok[window:] = values[window:] <= values[:-window]
+    result = run_length(ok) >= bars
+    result[:window + bars - 1] = False
+    return result
+
+
+def _rolling_extreme(values, window, ufunc, fill):
+    # van Herk / Gil-Werman：按 window 分块，块内前缀和后缀的累计极值，
+    # 窗口 [t-window+1, t] 的极值 = 起点处的后缀极值与终点处的前缀极值之一，O(n) 与 window 无关
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if window < 1 or window > n:
+        return result
+    blocks = np.concatenate([values, np.full(-n % window, fill)]).reshape(-1, window)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    result[window - 1:] = ufunc(suffix[:n - window + 1], prefix[window - 1:n])
+    return result
+
+
+def rolling_max(values, window):
+    # 与 talib.MAX 相同：包含当根在内最近 window 个值的最大值，前 window-1 个为 nan
+    return _rolling_extreme(values, window, np.maximum, -np.inf)
+
+
+def rolling_min(values, window):
+    return _rolling_extreme(values, window, np.minimum, np.inf)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+# 把交易所导出的 K 线（CSV / JSON）导入 bar 存储。
+# 按块流式读取，内存只和块大小有关；检查时间戳对齐到周期并且严格递增；
+# 缺失的 bar 可以补齐（gaps="fill"，用前收盘价、成交量为 0）或只记录在 meta.json 中（gaps="flag"）。
+# 写基础频率的同时，在同一遍里把每一块聚合成所有更粗的频率，不需要再读一遍。
+#
+#     python -m backtest ingest huobi_cny_btc btc-2017-*.csv --out store/ --gaps fill
+#
+# CSV 需要表头；JSON 可以是 K 线数组，也可以每行一条（JSON lines），每条是对象或
+# [timestamp, open, high, low, close, volume] 数组。时间戳可以是秒、毫秒或时间字符串。
+
+import json
+
+import numpy as np
+
+from .bars import Bars, bucket_start, concat, resample
+from .constants import FIELDS, FREQUENCIES, FREQUENCY_SECONDS
+
+# 每块的行数
+CHUNK = 100000
+GAPS = ("flag", "fill")
+# 常见导出格式里的列名
+ALIASES = {
+    "timestamp": ("timestamp", "time", "ts", "id", "date", "datetime", "open_time"),
+    "open": ("open", "o"),
+    "high": ("high", "h"),
+    "low": ("low", "l"),
+    "close": ("close", "c"),
+    "volume": ("volume", "amount", "vol", "v"),
+}
+
+
+def _rename(names):
+    # 输入列名 -> 字段名
+    lower = dict((str(name).strip().lower(), name) for name in names)
+    mapping = {}
+    for field in ["timestamp"] + FIELDS:
+        for alias in ALIASES[field]:
+            if alias in lower:
+                mapping[field] = lower[alias]
+                break
+        else:
+            raise ValueError("K 线数据缺少 %s 列，现有的列: %s" % (field, ", ".join(map(str, names))))
+    return mapping
+
+
+def to_seconds(values):
+    # 整数秒、毫秒或时间字符串 -> int64 秒
+    import pandas as pd
+
+    values = np.asarray(values)
+    if values.dtype.kind not in "iuf":
+        numeric = pd.to_numeric(pd.Series(values), errors="coerce")
+        if numeric.isna().any():
+            return pd.to_datetime(pd.Series(values)).values.astype("datetime64[s]").astype(np.int64)
+        values = numeric.values
+    values = values.astype(np.int64)
+    if len(values) and values.max() > 100000000000:
+        values = values // 1000
+    return values
+
+
+def _bars(columns):
+    timestamp = to_seconds(columns["timestamp"])
+    bars = Bars(timestamp, *[np.asarray(columns[field], dtype=np.float64) for field in FIELDS])
+    if any(np.isnan(bars[field]).any() for field in FIELDS):
+        raise ValueError("K 线数据中有空值，第一根在 %s 附近" % timestamp[0])
+    return bars
+
+
+def read_csv(path, chunksize=CHUNK, sep=","):
+    import pandas as pd
+
+    for frame in pd.read_csv(path, sep=sep, chunksize=chunksize, float_precision="round_trip"):
+        mapping = _rename(frame.columns)
+        yield _bars(dict((field, frame[name].values) for field, name in mapping.items()))
+
+
+def _json_items(path, blocksize=1 << 20):
+    # 逐条解析 JSON 数组或 JSON lines，不把整个文件读进内存
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        buffer = f.read(blocksize)
+        eof = not buffer
+        pos = len(buffer) - len(buffer.lstrip())
+        # 最外层的数组：[[...], ...] 或 [{...}, ...]；JSON lines 的一行 [1504224000, ...] 不算
+        if buffer[pos:pos + 1] == "[" and buffer[pos + 1:].lstrip()[:1] in ("[", "{"):
+            pos += 1
+        while True:
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,]":
+                    pos += 1
+                if pos == len(buffer):
+                    break
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    break
+                if end == len(buffer) and not eof:
+                    break
+                yield item
+                pos = end
+            if eof:
+                return
+            block = f.read(blocksize)
+            eof = not block
+            buffer = buffer[pos:] + block
+            pos = 0
+
+
+def _records(items):
+    if isinstance(items[0], dict):
+        mapping = _rename(list(items[0]))
+        return _bars(dict((field, [item[name] for item in items]) for field, name in mapping.items()))
+    return _bars(dict(zip(["timestamp"] + FIELDS, zip(*[item[:6] for item in items]))))
+
+
+def read_json(path, chunksize=CHUNK):
+    items = []
+    for item in _json_items(path):
+        items.append(item)
+        if len(items) == chunksize:
+            yield _records(items)
+            items = []
+    if items:
+        yield _records(items)
+
+
+def read_klines(path, chunksize=CHUNK, fmt=None):
+    # 按扩展名判断格式
+    if fmt is None:
+        fmt = "json" if path.lower().endswith((".json", ".jsonl")) else "csv"
+    if fmt == "json":
+        return read_json(path, chunksize)
+    if fmt == "csv":
+        return read_csv(path, chunksize)
+    raise ValueError("不支持的格式: %s" % fmt)
+
+
+class Resampler(object):
+    # 流式聚合：每块聚合成 frequency 的 bar。最后一个周期可能还没走完，
+    # 把它的原始 bar 留到下一块一起聚合，结果与对整段数据调用 resample 逐位一致
+    def __init__(self, frequency):
+        self.frequency = frequency
+        self.pending = Bars.empty()
+
+    def push(self, bars):
+        bars = concat([self.pending, bars])
+        if len(bars) == 0:
+            return bars
+        key = bucket_start(bars.timestamp, self.frequency)
+        split = bars.search(key[-1] - 1)
+        self.pending = bars.slice(split, len(bars))
+        return resample(bars.slice(0, split), self.frequency)
+
+    def flush(self):
+        bars, self.pending = self.pending, Bars.empty()
+        return resample(bars, self.frequency)
+
+
+def fill_gaps(bars, seconds, prev_timestamp=None, prev_close=None):
+    # 补齐缺失的 bar：开高低收都等于前收盘价，成交量为 0
+    first = bars.timestamp[0] if prev_timestamp is None else prev_timestamp + seconds
+    position = (bars.timestamp - first) // seconds
+    length = int(position[-1]) + 1
+    if length == len(bars):
+        return bars
+    real = np.zeros(length, dtype=bool)
+    real[position] = True
+    source = np.maximum.accumulate(np.where(real, np.cumsum(real) - 1, -1))
+    close = np.where(source >= 0, bars.close[np.maximum(source, 0)], np.nan if prev_close is None else prev_close)
+    columns = {"timestamp": first + np.arange(length, dtype=np.int64) * seconds, "volume": np.zeros(length)}
+    for field in ["open", "high", "low", "close"]:
+        column = close.copy()
+        column[position] = bars[field]
+        columns[field] = column
+    return Bars.from_columns(columns)
+
+
+def ingest(store, security, paths, frequency="1m", gaps="flag", chunksize=CHUNK, fmt=None):
+    # 按顺序导入 paths（多个文件视为连续的一段），返回基础频率的 meta
+    if gaps not in GAPS:
+        raise ValueError("不支持的缺口处理方式: %s" % gaps)
+    seconds = FREQUENCY_SECONDS[frequency]
+    coarser = [f for f in FREQUENCIES[FREQUENCIES.index(frequency) + 1:] if FREQUENCY_SECONDS[f] % seconds == 0]
+    writers = dict((f, store.writer(security, f)) for f in [frequency] + coarser)
+    resamplers = dict((f, Resampler(f)) for f in coarser)
+    missing = []
+    filled = 0
+    prev_timestamp = prev_close = None
+    try:
+        for path in paths:
+            for bars in read_klines(path, chunksize, fmt):
+                if len(bars) == 0:
+                    continue
+                timestamp = bars.timestamp
+                unaligned = np.flatnonzero(bucket_start(timestamp, frequency) != timestamp)
+                if len(unaligned):
+                    raise ValueError("%s: 时间戳 %s 不在 %s 周期的起点" % (path, timestamp[unaligned[0]], frequency))
+                # 与上一块的最后一根接起来检查
+                joined = timestamp if prev_timestamp is None else np.r_[prev_timestamp, timestamp]
+                step = np.diff(joined)
+                disorder = np.flatnonzero(step <= 0)
+                if len(disorder):
+                    i = disorder[0]
+                    raise ValueError("%s: 时间戳没有严格递增: %s 之后是 %s" % (path, joined[i], joined[i + 1]))
+                # 缺口记为 [缺失的第一根, 缺失的最后一根]
+                holes = np.flatnonzero(step > seconds)
+                missing.extend([int(joined[i] + seconds), int(joined[i + 1] - seconds)] for i in holes)
+                if gaps == "fill":
+                    size = len(bars)
+                    bars = fill_gaps(bars, seconds, prev_timestamp, prev_close)
+                    filled += len(bars) - size
+                prev_timestamp, prev_close = int(bars.timestamp[-1]), float(bars.close[-1])
+                writers[frequency].append(bars)
+                for f in coarser:
+                    writers[f].append(resamplers[f].push(bars))
+        for f in coarser:
+            writers[f].append(resamplers[f].flush())
+        # 基础频率先改名并写 meta，作为这次导入的提交点；之后的粗频率都可以由它重新生成
+        meta = writers[frequency].close(gaps=missing, filled=filled)
+        for f in coarser:
+            writers[f].close()
+    except Exception:
+        # 校验或写入失败时不留下写了一半的临时文件，已经 close 的频率不受影响
+        for writer in writers.values():
+            writer.abort()
+        raise
+    return meta
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+# 只依赖前一日 / 前几根 bar 的价位表：R-Breaker 的六个价位、Dual Thrust 的上下轨。
+# 对整段历史一次算完，策略按下标读取，不用在每根 bar 上重新计算同样的数；
+# 下标 t 的价位只用到第 t 根及以前的 bar，通过 context.indicators 读取时截止到当前 bar。
+#
+# 参数可以是数组：dual_thrust(..., window=[5, 10], K1=[[0.2], [0.3]]) 按 numpy 规则广播，
+# 结果的最后一维是时间，参数扫描时一次得到所有组合。
+
+import weakref
+
+import numpy as np
+
+from .indicators.vector import rolling_max, rolling_min
+
+RBREAKER_LEVELS = ("pivot", "buy_break", "sell_setup", "sell_enter", "buy_enter", "buy_setup", "sell_break")
+
+# Bars -> {(名称, 参数): 数组}，随 feed 中缓存的 bar 一起释放；同一进程内的多次回测共用
+_tables = weakref.WeakKeyDictionary()
+
+
+def rbreaker(high, low, close):
+    # 用第 t 根日线算出的价位，在第 t+1 天使用；与 策略/r-breaker.py 中的公式和运算顺序相同
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    pivot = (high + close + low) / 3
+    return {
+        "pivot": pivot,
+        "buy_break": high + 2 * (pivot - low),
+        "sell_setup": pivot + (high - low),
+        "sell_enter": 2 * pivot - low,
+        "buy_enter": 2 * pivot - high,
+        "buy_setup": pivot - (high - low),
+        "sell_break": low - 2 * (high - pivot),
+    }
+
+
+def _before(values, window, rolling):
+    # result[t] 为第 t 根之前 window 根（不含第 t 根）的极值；不足时为 nan
+    result = np.full(len(values), np.nan)
+    result[1:] = rolling(values[:-1], window)
+    return result
+
+
+def dual_thrust_range(high, low, close, window):
+    # 第 t 根 bar 之前 window 根的 max(HH - LC, HC - LL)，window 可以是数组（结果多一维）
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    windows = np.asarray(window, dtype=np.int64)
+    result = np.empty(windows.shape + (len(close),))
+    for index in np.ndindex(windows.shape):
+        n = int(windows[index])
+        hh, ll = _before(high, n, rolling_max), _before(low, n, rolling_min)
+        hc, lc = _before(close, n, rolling_max), _before(close, n, rolling_min)
+        result[index] = dual_thrust_spread(hh, hc, lc, ll)
+    return result
+
+
+def dual_thrust_spread(hh, hc, lc, ll):
+    # range = max(HH - LC, HC - LL)，四个参数为前 window 根的最高价、最高收盘价、最低收盘价、最低价
+    return np.maximum(hh - lc, hc - ll)
+
+
+def dual_thrust_bounds(open, price_range, K1, K2):
+    # (上轨, 下轨)：第 t 根 bar 的开盘价加减 K1 / K2 倍的 range
+    open = np.asarray(open, dtype=np.float64)
+    K1 = np.asarray(K1, dtype=np.float64)[..., None]
+    K2 = np.asarray(K2, dtype=np.float64)[..., None]
+    return open + K1 * price_range, open - K2 * price_range
+
+
+def dual_thrust(open, high, low, close, window, K1, K2):
+    # 与 wequant/dual_thrust/ltc.py 中 up_bound / low_bound 的算法和运算顺序相同
+    return dual_thrust_bounds(open, dual_thrust_range(high, low, close, window), K1, K2)
+
+
+def table(bars, name, params, build):
+    # 同一组 bar、同一组参数只计算一次
+    tables = _tables.setdefault(bars, {})
+    key = (name, tuple(sorted(params.items())))
+    if key not in tables:
+        tables[key] = build()
+    return tables[key]
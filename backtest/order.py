@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+# context.order：市价单和限价单的本地撮合。
+# 市价单按当前价格加减滑点成交；限价单在当前价格可成交时按不劣于限价的价格成交，否则不成交。
+# 买入佣金从买到的币中扣除，卖出佣金从得到的现金中扣除。
+# limit_fill="bars" 时当前价格可以成交的限价单仍立即成交，不能成交的不再作废，而是挂单由之后的 bar 按最高 / 最低价撮合，
+# participation 限制每根 bar 的成交量占 bar 成交量的比例，成交不完的部分留到之后的 bar；
+# 当前价格可以成交的限价单也受这个限制，当前 bar 成交不完的部分同样挂单，与已成交的部分共用一个编号。
+# place_limit / place_stop / place_trailing_stop 挂单，由引擎在之后的 bar 上撮合（见 resting.py），平台上没有这些方法。
+
+from .bars import to_datetime
+from .constants import CASH, min_order_cash_amount, min_order_quantity
+from .resting import RestingOrder, RestingOrders
+
+LIMIT_FILLS = ("immediate", "bars")
+
+
+class Trade(object):
+    def __init__(self, order_id, time, security, side, price, quantity, fee):
+        self.order_id = order_id
+        self.time = time
+        self.security = security
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.fee = fee
+
+    def __repr__(self):
+        return "Trade(%s %s %s %.8f@%.4f)" % (to_datetime(self.time), self.side, self.security,
+                                              self.quantity, self.price)
+
+
+class Order(object):
+    def __init__(self, account, data, log, commission=0.0, slippage=0.0, limit_fill="immediate", participation=None):
+        if limit_fill not in LIMIT_FILLS:
+            raise ValueError("不支持的限价单撮合方式: %s" % limit_fill)
+        self.account = account
+        self.data = data
+        self.log = log
+        self.commission = float(commission)
+        self.slippage = float(slippage)
+        self.limit_fill = limit_fill
+        self.participation = None if participation is None else float(participation)
+        self.trades = []
+        self.resting = RestingOrders()
+        # 当前撮合的 bar 上各标的已经用掉的成交量
+        self._volume_time = None
+        self._volume_used = {}
+        self._next_id = 1
+
+    def _new_id(self):
+        order_id = self._next_id
+        self._next_id += 1
+        return order_id
+
+    def _price(self, security):
+        price = self.data.get_current_price(security)
+        if price is None:
+            self.log.warn("%s 当前没有行情，无法下单" % security)
+        return price
+
+    def _fill_buy(self, order_id, security, price, quantity, time=None):
+        balances = self.account.balances
+        fee = quantity * self.commission
+        # 全仓买入时浮点误差可能让现金略小于 0
+        balances[CASH] = max(balances.get(CASH, 0.0) - price * quantity, 0.0)
+        balances[security] = balances.get(security, 0.0) + quantity - fee
+        time = self.data.clock.now if time is None else time
+        self.trades.append(Trade(order_id, time, security, "buy", price, quantity, fee * price))
+
+    def _fill_sell(self, order_id, security, price, quantity, time=None):
+        balances = self.account.balances
+        proceeds = price * quantity
+        fee = proceeds * self.commission
+        balances[security] = balances.get(security, 0.0) - quantity
+        balances[CASH] = balances.get(CASH, 0.0) + proceeds - fee
+        time = self.data.clock.now if time is None else time
+        self.trades.append(Trade(order_id, time, security, "sell", price, quantity, fee))
+
+    def _check_buy(self, security, cash):
+        if cash < min_order_cash_amount(security) or cash <= 0:
+            self.log.warn("订单无效，下单金额 %s 小于交易所最小交易金额" % cash)
+            return False
+        return True
+
+    def _check_sell(self, security, quantity):
+        if quantity < min_order_quantity(security) or quantity <= 0:
+            self.log.warn("订单无效，下单数量 %s 小于交易所最小交易数量" % quantity)
+            return False
+        return True
+
+    def buy(self, security, cash_amount):
+        # 市价买入，cash_amount 为花费的现金
+        price = self._price(security)
+        if price is None:
+            return None
+        cash = min(float(cash_amount), self.account.balances.get(CASH, 0.0))
+        if not self._check_buy(security, cash):
+            return None
+        fill_price = price * (1 + self.slippage)
+        order_id = self._new_id()
+        self._fill_buy(order_id, security, fill_price, cash / fill_price)
+        return order_id
+
+    def sell(self, security, quantity):
+        # 市价卖出
+        price = self._price(security)
+        if price is None:
+            return None
+        quantity = min(float(quantity), self.account.balances.get(security, 0.0))
+        if not self._check_sell(security, quantity):
+            return None
+        order_id = self._new_id()
+        self._fill_sell(order_id, security, price * (1 - self.slippage), quantity)
+        return order_id
+
+    def buy_limit(self, security, quantity, price):
+        market = self._price(security)
+        if market is None:
+            return None
+        limit = float(price)
+        fill_price = min(limit, market * (1 + self.slippage))
+        if market > limit:
+            if self.limit_fill == "bars":
+                return self._place(security, "buy", "limit", quantity, limit)
+            self.log.warn("限价买单 %s 低于当前价格 %s，未成交" % (limit, market))
+            return None
+        quantity = min(float(quantity), self.account.balances.get(CASH, 0.0) / fill_price)
+        if self._limited(security, quantity):
+            return self._fill_part(security, "buy", quantity, limit, fill_price)
+        if not self._check_buy(security, quantity * fill_price):
+            return None
+        order_id = self._new_id()
+        self._fill_buy(order_id, security, fill_price, quantity)
+        return order_id
+
+    def sell_limit(self, security, quantity, price):
+        market = self._price(security)
+        if market is None:
+            return None
+        limit = float(price)
+        if market < limit:
+            if self.limit_fill == "bars":
+                return self._place(security, "sell", "limit", quantity, limit)
+            self.log.warn("限价卖单 %s 高于当前价格 %s，未成交" % (limit, market))
+            return None
+        quantity = min(float(quantity), self.account.balances.get(security, 0.0))
+        fill_price = max(limit, market * (1 - self.slippage))
+        if self._limited(security, quantity):
+            return self._fill_part(security, "sell", quantity, limit, fill_price)
+        if not self._check_sell(security, quantity):
+            return None
+        order_id = self._new_id()
+        self._fill_sell(order_id, security, fill_price, quantity)
+        return order_id
+
+    def _limited(self, security, quantity):
+        # bars 模式设置了 participation 时，当前 bar 剩余的成交量不够成交 quantity
+        if self.limit_fill != "bars" or self.participation is None or quantity <= 0:
+            return False
+        return self._capacity(security, self.participation, self.data.clock.now) < quantity
+
+    def _fill_part(self, security, side, quantity, limit, fill_price):
+        # 当前 bar 按剩余的成交量成交一部分（不足最小下单量时不成交），其余部分按限价挂单，由之后的 bar 撮合
+        buy = side == "buy"
+        now = self.data.clock.now
+        order_id = self._new_id()
+        part = self._capacity(security, self.participation, now)
+        if part <= 0 or ((part * fill_price < min_order_cash_amount(security)) if buy
+                         else (part < min_order_quantity(security))):
+            part = 0.0
+        elif buy:
+            self._fill_buy(order_id, security, fill_price, part)
+        else:
+            self._fill_sell(order_id, security, fill_price, part)
+        self._volume_used[security] = self._volume_used.get(security, 0.0) + part
+        self._place(security, side, "limit", quantity - part, limit, order_id=order_id)
+        return order_id
+
+    def _place(self, security, side, kind, quantity, price=None, order_id=None, **kwargs):
+        if float(quantity) <= 0:
+            raise ValueError("挂单数量必须大于 0: %s" % quantity)
+        if kind != "trailing" and float(price) <= 0:
+            raise ValueError("挂单价格必须大于 0: %s" % price)
+        if kind == "limit":
+            kwargs["participation"] = self.participation
+        order_id = self._new_id() if order_id is None else order_id
+        order = RestingOrder(order_id, security, side, kind, quantity, price, placed=self.data.clock.now,
+                             **kwargs)
+        self.resting.add(order)
+        return order.order_id
+
+    def place_limit(self, security, side, quantity, price):
+        # 限价挂单，side 为 "buy" / "sell"，返回挂单编号
+        return self._place(security, side, "limit", quantity, price)
+
+    def place_stop(self, security, side, quantity, price):
+        # 止损挂单：价格向不利方向到达 price 时按市价成交
+        return self._place(security, side, "stop", quantity, price)
+
+    def place_trailing_stop(self, security, side, quantity, distance=None, ratio=None):
+        # 跟踪止损：卖单在价格从挂单以来的最高价回落 distance（或 ratio 比例）时成交，买单相反
+        if (distance is None) == (ratio is None):
+            raise ValueError("distance 和 ratio 需要且只能指定一个")
+        price = self._price(security)
+        if price is None:
+            return None
+        return self._place(security, side, "trailing", quantity, distance=distance, ratio=ratio, reference=price)
+
+    def oco(self, *order_ids):
+        # 一组挂单中任何一个成交后撤销其余的
+        missing = [order_id for order_id in order_ids if self.resting.get(order_id) is None]
+        if missing:
+            raise ValueError("没有这些挂单: %s" % ", ".join(map(str, missing)))
+        return self.resting.link(order_ids)
+
+    def cancel(self, order_id):
+        return self.resting.remove(order_id) is not None
+
+    def cancel_all(self, security=None):
+        for order in self.resting.open(security):
+            self.resting.remove(order.order_id)
+
+    def open_orders(self, security=None):
+        return self.resting.open(security)
+
+    def match(self):
+        # 引擎在每根 bar 调用 handle_data 之前按这根 bar 撮合挂单，返回成交的笔数
+        resting = self.resting
+        if not len(resting):
+            return 0
+        now = self.data.clock.now
+        filled = 0
+        while True:
+            due = resting.due(self.data.bars, now)
+            if due is None:
+                break
+            time, fills = due
+            for order, price in fills:
+                if resting.get(order.order_id) is None:
+                    # 同一批中被先成交的 OCO 挂单撤销了
+                    continue
+                # 余额不足以成交的挂单直接撤销，OCO 中的其它挂单只在真正成交后撤销
+                siblings = resting.siblings(order)
+                quantity, rest = self._fill_resting(order, time, price)
+                if rest:
+                    # 受成交量限制，剩余部分从下一根 bar 继续撮合
+                    order.quantity -= quantity
+                    resting.hold(order, time)
+                else:
+                    resting.remove(order.order_id)
+                if quantity:
+                    for order_id in siblings:
+                        resting.remove(order_id)
+                    filled += 1
+        resting.catch_up(self.data.bars, now)
+        return filled
+
+    def _capacity(self, security, participation, time):
+        # 这根 bar 上还能成交的数量：bar 成交量 × participation 减去同一标的已经成交的部分
+        if participation is None:
+            return float("inf")
+        if time != self._volume_time:
+            self._volume_time = time
+            self._volume_used = {}
+        bars = self.data.bars(security)
+        volume = bars.volume[bars.search(time, side="left")]
+        return max(volume * participation - self._volume_used.get(security, 0.0), 0.0)
+
+    def _fill_resting(self, order, time, price):
+        # 返回 (成交数量, 是否还有剩余留在挂单中)
+        security = order.security
+        balances = self.account.balances
+        buy = order.side == "buy"
+        if order.kind != "limit":
+            price *= 1 + self.slippage if buy else 1 - self.slippage
+        available = balances.get(CASH, 0.0) / price if buy else balances.get(security, 0.0)
+        quantity = min(order.quantity, available)
+        capacity = self._capacity(security, order.participation, time)
+        rest = capacity < quantity
+        if rest:
+            # 成交量不够时不报警，不足最小下单量就整单等到之后的 bar
+            quantity = capacity
+            if quantity <= 0 or ((quantity * price < min_order_cash_amount(security)) if buy
+                                 else (quantity < min_order_quantity(security))):
+                return 0.0, True
+        elif not (self._check_buy(security, quantity * price) if buy else self._check_sell(security, quantity)):
+            return 0.0, False
+        if buy:
+            self._fill_buy(order.order_id, security, price, quantity, time)
+        else:
+            self._fill_sell(order.order_id, security, price, quantity, time)
+        if order.participation is not None:
+            self._volume_used[security] = self._volume_used.get(security, 0.0) + quantity
+        return quantity, rest
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# 收盘价 / 成交量的前缀和：任意窗口、任意 bar 的简单均线只需一次相减，
+# 不同周期的均线和参数扫描中的每一组参数共用同一张表。
+#
+# 前缀和用 TwoSum 把每次累加的舍入误差单独累计到第二行，区间和 = 两行各自相减再相加，
+# 相对误差与对窗口直接求和相当，不会随着前缀和变大而变大。
+# bar 存储中的表保存在 <security>/<frequency>/index/<field>.cumsum.f8，参数扫描开始前预先生成，各进程通过 memmap 共用。
+#
+#     sums = prefix_sums(feed, "huobi_cny_ltc", "5m")
+#     sums.mean(100, 120)     # 第 100 到 119 根收盘价的均值
+#     sums.last_mean(20)      # 最近 20 根的均值
+#     sums.window_mean(20)    # 整段的 MA(20)，与 talib.SMA 对齐
+
+import weakref
+
+import numpy as np
+
+from .constants import FREQUENCIES
+from .store import load_index
+
+FIELDS = ("close", "volume")
+
+# Bars -> {字段: PrefixSums}
+_tables = weakref.WeakKeyDictionary()
+
+
+def cumulative(values):
+    # (2 × (n+1))：第 0 行为前缀和，第 1 行为累计的舍入误差，第 0 列为 0
+    values = np.asarray(values, dtype=np.float64)
+    table = np.zeros((2, len(values) + 1))
+    total = np.cumsum(values)
+    table[0, 1:] = total
+    previous = table[0, :-1]
+    # TwoSum(previous, values)：total = previous + values 的精确舍入误差
+    part = total - previous
+    error = (previous - (total - part)) + (values - part)
+    np.cumsum(error, out=table[1, 1:])
+    return table
+
+
+class PrefixSums(object):
+    def __init__(self, table, stop=None):
+        # stop 为可以查询的 bar 数（不含），截止到当前 bar 时使用
+        self.table = table
+        self.stop = table.shape[1] - 1 if stop is None else stop
+
+    @classmethod
+    def build(cls, values):
+        return cls(cumulative(values))
+
+    def __len__(self):
+        return self.stop
+
+    def until(self, stop):
+        return PrefixSums(self.table, min(stop, self.stop))
+
+    def sum(self, start, stop):
+        # 第 start 到 stop-1 根的和
+        if stop > self.stop or start < 0:
+            raise IndexError("区间 [%s, %s) 超出了 [0, %s)" % (start, stop, self.stop))
+        total, error = self.table
+        return float((total[stop] - total[start]) + (error[stop] - error[start]))
+
+    def mean(self, start, stop):
+        if stop <= start:
+            return float("nan")
+        return self.sum(start, stop) / (stop - start)
+
+    def last_mean(self, k):
+        # 最近 k 根（含当前 bar）的均值，不足 k 根时为 nan
+        if k > self.stop:
+            return float("nan")
+        return self.mean(self.stop - k, self.stop)
+
+    def window_mean(self, k):
+        # [t] 为第 t-k+1 到 t 根的均值，前 k-1 个为 nan
+        n = self.stop
+        result = np.full(n, np.nan)
+        if 1 <= k <= n:
+            total, error = self.table[:, :n + 1]
+            result[k - 1:] = ((total[k:] - total[:-k]) + (error[k:] - error[:-k])) / k
+        return result
+
+
+def prefix_sums(feed, security, frequency, field="close"):
+    bars = feed.bars(security, frequency)
+    tables = _tables.setdefault(bars, {})
+    if field not in tables:
+        path = None
+        if hasattr(feed, "index_path"):
+            path = feed.index_path(security, frequency, "%s.cumsum.f8" % field)
+        if path is None:
+            tables[field] = PrefixSums.build(bars[field])
+        else:
+            tables[field] = PrefixSums(load_index(path, (2, len(bars) + 1), lambda: cumulative(bars[field])))
+    return tables[field]
+
+
+def prepare(feed, fields=FIELDS):
+    # 为 bar 存储中所有标的、所有已保存的频率生成前缀和文件；参数扫描在启动工作进程之前调用
+    if not hasattr(feed, "index_path"):
+        return
+    for security in feed.securities():
+        for frequency in FREQUENCIES:
+            if feed.has(security, frequency):
+                for field in fields:
+                    prefix_sums(feed, security, frequency, field)
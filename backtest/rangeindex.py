@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# 区间最高 / 最低价的稀疏表：第 j 层第 i 个值为 [i, i + 2^j) 的极值，建一次 O(n log n)，
+# 之后任意区间 [start, stop) 的极值只需比较两个重叠的 2^j 段，O(1)；
+# 对固定窗口 k 可以一次算出所有 bar 的 [t-k, t) 极值，参数扫描中不同的 T / window_size 共用同一张表。
+#
+# bar 存储中的数据把表存在 <security>/<frequency>/index/<field>.<max|min>.f8，用 memmap 打开，
+# 扫描的各个进程共享；CSV 或聚合出来的频率只在内存中缓存。bar 数据重写时索引随之删除。
+#
+#     table = range_table(feed, "huobi_cny_ltc", "1d", "high")
+#     table.query(10, 30)    # 第 10 到 29 根的最高价
+#     table.window(20)       # [t] 为第 t 根之前 20 根的最高价
+
+import weakref
+
+import numpy as np
+
+from .store import load_index
+
+# Bars -> {(字段, 最大 / 最小): SparseTable}
+_tables = weakref.WeakKeyDictionary()
+
+
+def _depth(length):
+    # 需要的层数：最长的一层不超过 length
+    return max(int(length).bit_length(), 1)
+
+
+class SparseTable(object):
+    def __init__(self, table, maximum=True, stop=None):
+        # table: (层数 × bar 数)；stop 为可以查询的 bar 数（不含），截止到当前 bar 时使用
+        self.table = table
+        self.maximum = maximum
+        self.ufunc = np.maximum if maximum else np.minimum
+        self.stop = table.shape[1] if stop is None else stop
+
+    @classmethod
+    def build(cls, values, maximum=True):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        ufunc = np.maximum if maximum else np.minimum
+        table = np.empty((_depth(n), n))
+        table[0] = values
+        for j in range(1, len(table)):
+            half = 1 << (j - 1)
+            # 末尾不足 2^j 的位置不会被查询到，沿用上一层的值
+            ufunc(table[j - 1, :n - half], table[j - 1, half:], out=table[j, :n - half])
+            table[j, n - half:] = table[j - 1, n - half:]
+        return cls(table, maximum)
+
+    def __len__(self):
+        return self.stop
+
+    def until(self, stop):
+        # 只能查询前 stop 根 bar 的视图
+        return SparseTable(self.table, self.maximum, min(stop, self.stop))
+
+    def query(self, start, stop):
+        # [start, stop) 的极值，区间为空时返回 nan
+        if stop > self.stop or start < 0:
+            raise IndexError("区间 [%s, %s) 超出了 [0, %s)" % (start, stop, self.stop))
+        start, stop = int(start), int(stop)
+        if stop <= start:
+            return float("nan")
+        j = (stop - start).bit_length() - 1
+        return float(self.ufunc(self.table[j, start], self.table[j, stop - (1 << j)]))
+
+    def queries(self, starts, stops):
+        # 向量化的 query，空区间为 nan
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+        if len(stops) and (stops.max() > self.stop or starts.min() < 0):
+            raise IndexError("查询区间超出了 [0, %s)" % self.stop)
+        lengths = stops - starts
+        empty = lengths <= 0
+        j = np.frexp(np.maximum(lengths, 1))[1] - 1
+        first = np.where(empty, 0, starts)
+        last = np.where(empty, 0, stops - (1 << j))
+        result = self.ufunc(self.table[j, first], self.table[j, last])
+        result[empty] = np.nan
+        return result
+
+    def window(self, k):
+        # [t] 为 [t-k, t) 的极值，即第 t 根之前 k 根 bar（不含第 t 根），前 k 个为 nan
+        n, k = self.stop, int(k)
+        result = np.full(n, np.nan)
+        if k < 1 or k >= n:
+            return result
+        j = k.bit_length() - 1
+        level = self.table[j]
+        self.ufunc(level[:n - k], level[k - (1 << j):n - (1 << j)], out=result[k:])
+        return result
+
+
+def range_table(feed, security, frequency, field="high", maximum=True):
+    bars = feed.bars(security, frequency)
+    tables = _tables.setdefault(bars, {})
+    key = (field, maximum)
+    if key not in tables:
+        path = None
+        if hasattr(feed, "index_path"):
+            path = feed.index_path(security, frequency, "%s.%s.f8" % (field, "max" if maximum else "min"))
+        if path is None or len(bars) == 0:
+            tables[key] = SparseTable.build(bars[field], maximum)
+        else:
+            shape = (_depth(len(bars)), len(bars))
+            tables[key] = SparseTable(load_index(path, shape, lambda: SparseTable.build(bars[field], maximum).table),
+                                      maximum)
+    return tables[key]
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+# 挂单：限价单、止损单、跟踪止损单和 OCO（一个成交其余撤销），由引擎按 bar 的开高低价撮合，
+# 策略挂一次单之后不用每根 bar 检查价格。挂单从下一根 bar 开始参与撮合：
+#
+#   限价买单   最低价 <= 限价时成交，价格为 min(开盘价, 限价)（跳空低开按开盘价）
+#   限价卖单   最高价 >= 限价时成交，价格为 max(开盘价, 限价)
+#   止损买单   最高价 >= 触发价时按 max(开盘价, 触发价) 加滑点成交
+#   止损卖单   最低价 <= 触发价时按 min(开盘价, 触发价) 减滑点成交
+#   跟踪止损   卖单的触发价为挂单以来的最高价减 distance（或乘以 1 - ratio），买单为最低价加 distance；
+#              每根 bar 先用之前的最高 / 最低价判断是否触发，再用这根 bar 更新
+#
+# 限价单设置了成交量参与率 participation 时，每根 bar 最多成交 bar 成交量 × participation（同一标的的挂单共用），
+# 没成交完的部分留到之后的 bar 继续撮合，成交量为 0 的 bar 不会成交。
+#
+# 同一根 bar 上多个挂单都可以成交时，止损类先于限价单（bar 内价格路径未知，按不利的情况处理），其次按挂单顺序。
+# 撮合按 bar 数组向量化：止损类每个挂单从上次撮合过的 bar 往后一次找到第一根成交的 bar；
+# 限价单按标的放进挂单簿（book.py），只用最优买价 / 卖价向后查找，挂单再多每根 bar 也只比较两个价格，
+# 找到的 bar 上按价格-时间优先一次成交所有可以成交的价位。
+# 上面的规则在 selfcheck.py 中用手工构造的 bar 逐条核对：python -m backtest selfcheck
+
+import numpy as np
+
+from .book import OrderBook
+
+KINDS = ("limit", "stop", "trailing")
+SIDES = ("buy", "sell")
+# 向后查找时第一块的 bar 数，之后每块翻倍
+SEARCH_CHUNK = 256
+
+
+class RestingOrder(object):
+    def __init__(self, order_id, security, side, kind, quantity, price=None, distance=None, ratio=None,
+                 placed=None, reference=None, participation=None):
+        if side not in SIDES:
+            raise ValueError("不支持的买卖方向: %s" % side)
+        if kind not in KINDS:
+            raise ValueError("不支持的挂单类型: %s" % kind)
+        self.order_id = order_id
+        self.security = security
+        self.side = side
+        self.kind = kind
+        self.quantity = float(quantity)
+        self.price = None if price is None else float(price)
+        self.distance = None if distance is None else float(distance)
+        self.ratio = None if ratio is None else float(ratio)
+        self.participation = None if participation is None else float(participation)
+        # 已经撮合过的最后一根 bar 的起始时间，挂单从下一根 bar 开始撮合
+        self.checked = placed
+        # 跟踪止损：挂单以来的最高价（卖单）或最低价（买单）
+        self.extreme = reference
+        self.group = None
+
+    def __repr__(self):
+        price = self.price if self.kind != "trailing" else self.trigger_price(self.extreme)
+        return "RestingOrder(%s %s %s %s %.8f@%s)" % (self.order_id, self.kind, self.side, self.security,
+                                                     self.quantity, price)
+
+    def trigger_price(self, extreme):
+        # 跟踪止损在给定最高 / 最低价下的触发价，extreme 可以是数组
+        if self.side == "sell":
+            return extreme - self.distance if self.distance is not None else extreme * (1 - self.ratio)
+        return extreme + self.distance if self.distance is not None else extreme * (1 + self.ratio)
+
+    def scan(self, bars, start, stop):
+        # 在第 start 到 stop-1 根 bar 中找第一根成交的 bar，返回 (下标, 成交价, 跟踪止损新的极值)；
+        # 没有成交时下标为 None。不修改挂单本身
+        extreme = self.extreme
+        k = start
+        size = SEARCH_CHUNK
+        while k < stop:
+            chunk = min(stop, k + size)
+            low, high = bars.low[k:chunk], bars.high[k:chunk]
+            if self.kind == "trailing":
+                if self.side == "sell":
+                    before = np.maximum.accumulate(np.r_[extreme, high[:-1]])
+                    level = self.trigger_price(before)
+                    hit = low <= level
+                else:
+                    before = np.minimum.accumulate(np.r_[extreme, low[:-1]])
+                    level = self.trigger_price(before)
+                    hit = high >= level
+                if hit.any():
+                    j = int(np.argmax(hit))
+                    return k + j, self._price(bars.open[k + j], level[j]), before[j]
+                extreme = max(extreme, high.max()) if self.side == "sell" else min(extreme, low.min())
+            else:
+                buy_limit = self.side == "buy" and self.kind == "limit"
+                sell_stop = self.side == "sell" and self.kind == "stop"
+                hit = low <= self.price if buy_limit or sell_stop else high >= self.price
+                if self.participation is not None:
+                    hit &= bars.volume[k:chunk] > 0
+                if hit.any():
+                    j = int(np.argmax(hit))
+                    return k + j, self._price(bars.open[k + j], self.price), extreme
+            k = chunk
+            size *= 2
+        return None, None, extreme
+
+    def _price(self, open, level):
+        # 限价单按不劣于限价的价格成交；止损类在跳空时按开盘价成交（滑点由 Order 另外加上）
+        if (self.side == "buy") == (self.kind == "limit"):
+            return float(min(open, level))
+        return float(max(open, level))
+
+
+class LimitBook(OrderBook):
+    # 回测中一个标的的限价挂单：同一标的的限价单共用撮合进度 checked
+    def __init__(self, checked):
+        OrderBook.__init__(self)
+        self.checked = checked
+        self.participation = False
+
+    def add(self, order):
+        if not self.live:
+            self.checked = order.checked
+        self.participation = self.participation or order.participation is not None
+        OrderBook.add(self, order)
+
+    def scan(self, bars, start, stop):
+        # 第 start 到 stop-1 根 bar 中第一根有挂单可以成交的 bar 的下标，没有时为 None
+        bid, ask = self.best_bid(), self.best_ask()
+        k = start
+        size = SEARCH_CHUNK
+        while k < stop:
+            chunk = min(stop, k + size)
+            hit = np.zeros(chunk - k, dtype=bool)
+            if bid is not None:
+                hit |= bars.low[k:chunk] <= bid
+            if ask is not None:
+                hit |= bars.high[k:chunk] >= ask
+            if self.participation:
+                hit &= bars.volume[k:chunk] > 0
+            if hit.any():
+                return k + int(np.argmax(hit))
+            k = chunk
+            size *= 2
+        return None
+
+
+class RestingOrders(object):
+    # 所有未成交的挂单。限价单按标的放在挂单簿中，止损类逐个撮合
+    def __init__(self):
+        self.orders = {}
+        self.books = {}
+        self._groups = {}
+        self._next_group = 1
+
+    def __len__(self):
+        return len(self.orders)
+
+    def add(self, order):
+        self.orders[order.order_id] = order
+        if order.kind == "limit":
+            if order.security not in self.books:
+                self.books[order.security] = LimitBook(order.checked)
+            self.books[order.security].add(order)
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def remove(self, order_id):
+        # 撤单或成交后移出，返回被移出的挂单
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            if order.group is not None:
+                self._groups[order.group].discard(order_id)
+            if order.kind == "limit":
+                self.books[order.security].cancel(order_id)
+        return order
+
+    def hold(self, order, time):
+        # 挂单在 time 这根 bar 只成交了一部分（成交量用完），剩余部分从下一根 bar 继续撮合
+        if order.kind == "limit":
+            self.books[order.security].checked = time
+        else:
+            order.checked = time
+
+    def link(self, order_ids):
+        # OCO：其中一个成交时撤销其余的
+        group = self._next_group
+        self._next_group += 1
+        self._groups[group] = set(order_ids)
+        for order_id in order_ids:
+            self.orders[order_id].group = group
+        return group
+
+    def siblings(self, order):
+        if order.group is None:
+            return []
+        return [order_id for order_id in self._groups.get(order.group, ()) if order_id != order.order_id]
+
+    def open(self, security=None):
+        return [order for order in self.orders.values() if security is None or order.security == security]
+
+    def _stops(self):
+        return [order for order in self.orders.values() if order.kind != "limit"]
+
+    def _books(self):
+        return [(security, book) for security, book in self.books.items() if book]
+
+    def due(self, bars_of, now):
+        # 截至 now 这根 bar 最早的一批成交：返回 (bar 时间, [(挂单, 成交价), ...])，没有时返回 None。
+        # 止损类一次一个；限价单一次取出挂单簿在这根 bar 上可以成交的所有挂单
+        best = None
+        for order in self._stops():
+            bars = bars_of(order.security)
+            start = bars.search(order.checked) if order.checked is not None else 0
+            j, price, _ = order.scan(bars, start, bars.search(now))
+            if j is None:
+                continue
+            key = (int(bars.timestamp[j]), False, order.order_id)
+            if best is None or key < best[0]:
+                best = (key, [(order, price)])
+        for security, book in self._books():
+            bars = bars_of(security)
+            start = bars.search(book.checked) if book.checked is not None else 0
+            j = book.scan(bars, start, bars.search(now))
+            if j is None:
+                continue
+            fills = [(order, order._price(bars.open[j], order.price))
+                     for order in book.crossable(bars.low[j], bars.high[j])]
+            key = (int(bars.timestamp[j]), True, min(order.order_id for order, _ in fills))
+            if best is None or key < best[0]:
+                best = (key, fills)
+        if best is None:
+            return None
+        return best[0][0], best[1]
+
+    def catch_up(self, bars_of, now):
+        # 撮合完成后把所有挂单的进度推进到 now，跟踪止损更新极值
+        for order in self._stops():
+            bars = bars_of(order.security)
+            start = bars.search(order.checked) if order.checked is not None else 0
+            stop = bars.search(now)
+            if start < stop and order.kind == "trailing":
+                if order.side == "sell":
+                    order.extreme = max(order.extreme, float(bars.high[start:stop].max()))
+                else:
+                    order.extreme = min(order.extreme, float(bars.low[start:stop].min()))
+            order.checked = now
+        for book in self.books.values():
+            book.checked = now
+
+    def next_touch(self, bars_of, timestamps, start, stop):
+        # 时间轴上第 start 到 stop-1 根中第一根可能有挂单成交的 bar，没有时返回 stop
+        if not self.orders or stop <= start:
+            return stop
+        end = timestamps[stop - 1]
+        found = []
+        for order in self._stops():
+            bars = bars_of(order.security)
+            first = bars.search(order.checked) if order.checked is not None else 0
+            found.append((bars, order.scan(bars, first, bars.search(end))[0]))
+        for security, book in self._books():
+            bars = bars_of(security)
+            first = bars.search(book.checked) if book.checked is not None else 0
+            found.append((bars, book.scan(bars, first, bars.search(end))))
+        for bars, j in found:
+            if j is not None:
+                stop = min(stop, max(start, int(np.searchsorted(timestamps, bars.timestamp[j], side="left"))))
+        return stop
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+# 自检：在手工构造的数据上核对容易出错的边界情况（指标的 nan / inf，挂单的撮合顺序），
+# 任何一项不符时抛出 AssertionError。
+#
+#     python -m backtest selfcheck
+
+import numpy as np
+
+from .bars import Bars, parse_time
+from .constants import CASH
+from .engine import Engine
+from .indicators import EMV, emv
+
+SECURITY = "huobi_cny_btc"
+
+
+def _same(actual, expected, tolerance=1e-9):
+    # nan 的位置相同，其余值在误差以内
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    assert (np.isnan(actual) == np.isnan(expected)).all(), "nan 的位置不同"
+    valid = ~np.isnan(expected)
+    assert np.allclose(actual[valid], expected[valid], rtol=0, atol=tolerance), "数值不同"
+
+
+def check_emv():
+    # 含成交量为 0 的 bar（em 为 inf 或 nan）时，向量和流式的 EMV 都与 wequant/emv 中 pandas 的算法一致
+    import pandas as pd
+
+    timeperiod = 14
+    rng = np.random.RandomState(7)
+    low = 100 + np.cumsum(rng.normal(0, 1, 300))
+    high = low + rng.uniform(0.1, 2, 300)
+    volume = rng.uniform(10, 1000, 300)
+    # em 为 +inf / -inf / nan（最高价等于最低价且成交量为 0）的 bar，以及相邻的两根
+    volume[[40, 41, 120, 200]] = 0
+    high[200] = low[200]
+    low[120] = low[119] - 5
+    high[120] = low[120] + 1
+
+    frame = pd.DataFrame({"high": high, "low": low, "volume": volume})
+    mid = (frame["high"] + frame["low"]) / 2
+    em = (mid - mid.shift(1)) * (frame["high"] - frame["low"]) / frame["volume"]
+    expected = em.rolling(timeperiod).sum().values
+    assert np.isinf(em.values).any() and np.isnan(expected[timeperiod + 1:]).any()
+
+    _same(emv(high, low, volume, timeperiod), expected)
+    stream = EMV(timeperiod)
+    _same([stream.update(h, l, v) for h, l, v in zip(high, low, volume)], expected)
+
+
+class _Feed(object):
+    # 内存中的一组 bar，代替 CSV / bar 存储
+    def __init__(self, bars):
+        self._bars = bars
+
+    def bars(self, security, frequency):
+        return self._bars
+
+
+class _Script(object):
+    # 第一根 bar 调用 place(context.order) 挂单，place 返回 {名字: 挂单编号}；
+    # 记录每次调用 handle_data 的 bar 下标和当时各跟踪止损的极值。
+    # wait 时登记一个不会触及的价位，之后只有挂单成交的 bar 才调用 handle_data
+    def __init__(self, bars, place, wait):
+        self.bars = bars
+        self.place = place
+        self.wait = wait
+        self.names = None
+        self.calls = []
+
+    def initialize(self, context):
+        context.security = SECURITY
+        context.frequency = "60m"
+
+    def handle_data(self, context):
+        if self.names is None:
+            self.names = self.place(context.order)
+        extremes = dict((order.order_id, order.extreme) for order in context.order.open_orders()
+                        if order.kind == "trailing")
+        self.calls.append((self.bars.search(context.data.clock.now, side="left"), extremes))
+        if self.wait:
+            context.triggers.add(SECURITY, below=1)
+
+
+def _bars(rows):
+    # rows 为逐根的 (开, 高, 低, 收)，60m bar，成交量都为 100
+    rows = np.asarray(rows, dtype=np.float64)
+    timestamp = parse_time("2017-01-01 00:00:00") + 3600 * np.arange(len(rows))
+    return Bars(timestamp.astype(np.int64), rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], np.full(len(rows), 100.0))
+
+
+def _run(rows, place, balances, wait=False, **params):
+    # 返回 (策略, [(bar 下标, 挂单名字, 方向, 成交价, 数量)], 回测结束时的 order)
+    bars = _bars(rows)
+    script = _Script(bars, place, wait)
+    params.update(start_time=int(bars.timestamp[0]), end_time=int(bars.timestamp[-1]) + 3600,
+                  account_initial=balances, commission=0.0)
+    engine = Engine(script, _Feed(bars), params, log_stream=None)
+    engine.run()
+    names = dict((order_id, name) for name, order_id in script.names.items())
+    trades = [(bars.search(trade.time, side="left"), names[trade.order_id], trade.side, trade.price, trade.quantity)
+              for trade in engine.context.order.trades]
+    return script, trades, engine.context.order
+
+
+def _same_trades(actual, expected):
+    assert len(actual) == len(expected), "成交笔数不同: %s" % (actual,)
+    for trade, wanted in zip(actual, expected):
+        assert trade[:3] == wanted[:3] and np.isclose(trade[3], wanted[3], rtol=0, atol=1e-9) \
+            and np.isclose(trade[4], wanted[4], rtol=0, atol=1e-9), "%s != %s" % (trade, wanted)
+
+
+def check_resting_fills():
+    # 各类挂单的成交 bar 和成交价；跟踪止损的极值在每次撮合后推进到当前 bar；
+    # 登记不会触及的价位跳过中间的 bar 时，只在有挂单成交的 bar 停下，结果与逐 bar 相同
+    slippage = 0.01
+    rows = [(100, 101, 99, 100),
+            (100, 103, 97, 102),      # 跟踪止损极值 103
+            (102, 104, 96, 97),       # trailing 用之前的极值 103 触发：97
+            (96, 97, 94, 95),         # 限价买 95
+            (95, 96, 91, 93),         # 止损卖 92
+            (106, 107, 105.5, 106),   # 跳空高开，限价卖按开盘价 106
+            (109, 110, 108.5, 109),   # 跳空高开，止损买按开盘价 109
+            (100, 101, 99, 100)]
+
+    def place(order):
+        return {"buy_limit": order.place_limit(SECURITY, "buy", 1, 95),
+                "sell_limit": order.place_limit(SECURITY, "sell", 1, 105),
+                "buy_stop": order.place_stop(SECURITY, "buy", 1, 108),
+                "sell_stop": order.place_stop(SECURITY, "sell", 1, 92),
+                "trailing": order.place_trailing_stop(SECURITY, "sell", 1, distance=6),
+                "ratio": order.place_trailing_stop(SECURITY, "sell", 1, ratio=0.2)}
+
+    expected = [(2, "trailing", "sell", 97 * (1 - slippage), 1),
+                (3, "buy_limit", "buy", 95, 1),
+                (4, "sell_stop", "sell", 92 * (1 - slippage), 1),
+                (5, "sell_limit", "sell", 106, 1),
+                (6, "buy_stop", "buy", 109 * (1 + slippage), 1)]
+    balances = {CASH: 100000, SECURITY: 10}
+    every, trades, order = _run(rows, place, balances, slippage=slippage, limit_fill="bars")
+    _same_trades(trades, expected)
+    assert [o.order_id for o in order.open_orders()] == [every.names["ratio"]]
+    # ratio 的极值：挂单时的收盘价 100，之后每根 bar 撮合后为截至这根 bar 的最高价
+    ratio = every.names["ratio"]
+    highs = np.maximum.accumulate(np.r_[100, _bars(rows).high[1:]])
+    assert [bar for bar, _ in every.calls] == list(range(len(rows)))
+    assert [extremes[ratio] for _, extremes in every.calls[1:]] == list(highs[1:])
+
+    woken, trades, _ = _run(rows, place, balances, wait=True, slippage=slippage, limit_fill="bars")
+    _same_trades(trades, expected)
+    assert [bar for bar, _ in woken.calls] == [0, 2, 3, 4, 5, 6]
+    # 跳过的 bar 在下一次撮合时一起计入极值
+    assert [extremes[ratio] for _, extremes in woken.calls] == [every.calls[bar][1][ratio] for bar, _ in woken.calls]
+
+
+def check_resting_priority():
+    # 同一根 bar 上止损类先于限价单（即使挂单更晚），限价单按价格-时间优先
+    rows = [(100, 101, 99, 100),
+            (100, 100.5, 94, 95),
+            (95, 96, 94, 95)]
+
+    def place(order):
+        return {"early": order.place_limit(SECURITY, "buy", 1, 95),
+                "stop": order.place_stop(SECURITY, "sell", 1, 96),
+                "late": order.place_limit(SECURITY, "buy", 1, 95),
+                "better": order.place_limit(SECURITY, "buy", 1, 96)}
+
+    _, trades, _ = _run(rows, place, {CASH: 100000, SECURITY: 1}, slippage=0.0)
+    _same_trades(trades, [(1, "stop", "sell", 96, 1),
+                          (1, "better", "buy", 96, 1),
+                          (1, "early", "buy", 95, 1),
+                          (1, "late", "buy", 95, 1)])
+
+
+def check_resting_oco():
+    # OCO：同一根 bar 上两个都可以成交时只成交优先的一个；余额不足没有成交时不撤销其它挂单
+    rows = [(100, 101, 99, 100),
+            (100, 106, 94, 100),
+            (94, 95, 92, 93)]
+
+    def bracket(order):
+        names = {"take": order.place_limit(SECURITY, "sell", 1, 105),
+                 "stop": order.place_stop(SECURITY, "sell", 1, 95)}
+        order.oco(names["take"], names["stop"])
+        return names
+
+    _, trades, order = _run(rows, bracket, {CASH: 0, SECURITY: 1}, slippage=0.0)
+    _same_trades(trades, [(1, "stop", "sell", 95, 1)])
+    assert not order.open_orders()
+
+    def limits(order):
+        names = {"sell": order.place_limit(SECURITY, "sell", 1, 104),
+                 "buy": order.place_limit(SECURITY, "buy", 1, 97)}
+        order.oco(names["sell"], names["buy"])
+        return names
+
+    # 同一批取出的两个限价单，买单先成交，卖单随之撤销
+    _, trades, order = _run(rows, limits, {CASH: 100000, SECURITY: 1}, slippage=0.0)
+    _same_trades(trades, [(1, "buy", "buy", 97, 1)])
+    assert not order.open_orders()
+
+    def unfunded(order):
+        names = {"stop": order.place_stop(SECURITY, "sell", 1, 95),
+                 "buy": order.place_limit(SECURITY, "buy", 1, 93)}
+        order.oco(names["stop"], names["buy"])
+        return names
+
+    # 没有币，止损卖单触发时作废，限价买单留下并在之后成交
+    _, trades, order = _run(rows, unfunded, {CASH: 100000}, slippage=0.0)
+    _same_trades(trades, [(2, "buy", "buy", 93, 1)])
+    assert not order.open_orders()
+
+
+def check_participation():
+    # participation 为 0.01、成交量 100 时每根 bar 最多成交 1：当前价格可以成交的限价单只成交 1，
+    # 其余按限价挂单，共用一个编号，之后的 bar 上每根成交 1
+    rows = [(100, 101, 99, 100)] * 4
+
+    def cross(order):
+        return {"limit": order.buy_limit(SECURITY, 3, 101)}
+
+    _, trades, order = _run(rows, cross, {CASH: 100000}, slippage=0.0, limit_fill="bars", participation=0.01)
+    _same_trades(trades, [(0, "limit", "buy", 100, 1), (1, "limit", "buy", 100, 1), (2, "limit", "buy", 100, 1)])
+    assert not order.open_orders()
+
+    def sell(order):
+        return {"limit": order.sell_limit(SECURITY, 2.5, 99)}
+
+    _, trades, order = _run(rows, sell, {CASH: 0, SECURITY: 10}, slippage=0.0, limit_fill="bars",
+                            participation=0.01)
+    _same_trades(trades, [(0, "limit", "sell", 100, 1), (1, "limit", "sell", 100, 1), (2, "limit", "sell", 100, 0.5)])
+
+
+CHECKS = [check_emv, check_resting_fills, check_resting_priority, check_resting_oco, check_participation]
+
+
+def run():
+    for check in CHECKS:
+        check()
+        print("%s: ok" % check.__name__)
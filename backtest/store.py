@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+# 列式 bar 存储：每个 security/frequency 一个目录，每个字段一个连续的二进制文件，
+# 用 numpy.memmap 只读打开，切片不复制数据。
+#
+# <root>/barstore.json
+# <root>/<security>/<frequency>/timestamp.i8   int64 秒
+# <root>/<security>/<frequency>/open.f8 ...    float64
+# <root>/<security>/<frequency>/meta.json
+# <root>/<security>/<frequency>/index/        区间极值的稀疏表（rangeindex.py），按需生成
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from .bars import Bars, resample
+from .constants import FIELDS, FREQUENCIES, FREQUENCY_SECONDS
+
+MARKER = "barstore.json"
+COLUMNS = [("timestamp", np.int64, "timestamp.i8")] + [(field, np.float64, "%s.f8" % field) for field in FIELDS]
+
+
+def is_store(path):
+    return os.path.exists(os.path.join(path, MARKER))
+
+
+def load_index(path, shape, build):
+    # index/ 下的 float64 数组：文件存在且大小对得上就用 memmap 打开，否则调用 build() 重建并原子地写入
+    if os.path.exists(path) and os.path.getsize(path) == int(np.prod(shape)) * 8:
+        return np.memmap(path, dtype=np.float64, mode="r", shape=shape).view(np.ndarray)
+    array = np.ascontiguousarray(build(), dtype=np.float64)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # 多个扫描进程可能同时建同一个索引，各自写自己的临时文件
+    temp = "%s.%d.tmp" % (path, os.getpid())
+    array.tofile(temp)
+    os.replace(temp, path)
+    return array
+
+
+class BarStore(object):
+    def __init__(self, root):
+        self.root = root
+        self._cache = {}
+
+    def path(self, security, frequency):
+        return os.path.join(self.root, security, frequency)
+
+    def has(self, security, frequency):
+        return os.path.exists(os.path.join(self.path(security, frequency), "meta.json"))
+
+    def meta(self, security, frequency):
+        with open(os.path.join(self.path(security, frequency), "meta.json")) as f:
+            return json.load(f)
+
+    def index_path(self, security, frequency, name):
+        # 存储中实际有这个频率时，索引文件放在它的目录里；聚合出来的频率返回 None
+        if not self.has(security, frequency):
+            return None
+        return os.path.join(self.path(security, frequency), "index", name)
+
+    def securities(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def frequencies(self, security):
+        return [frequency for frequency in FREQUENCIES if self.has(security, frequency)]
+
+    def bars(self, security, frequency):
+        key = (security, frequency)
+        if key not in self._cache:
+            self._cache[key] = self._open(security, frequency)
+        return self._cache[key]
+
+    def _open(self, security, frequency):
+        if self.has(security, frequency):
+            length = self.meta(security, frequency)["length"]
+            if length == 0:
+                return Bars.empty()
+            directory = self.path(security, frequency)
+            # 转成普通 ndarray 视图（仍然映射同一块文件），逐个元素取值和切片时没有 memmap 子类的额外开销
+            return Bars(*[np.memmap(os.path.join(directory, filename), dtype=dtype, mode="r", shape=(length,))
+                          .view(np.ndarray) for _, dtype, filename in COLUMNS])
+        # 缺少的频率用更细的频率在内存中聚合
+        seconds = FREQUENCY_SECONDS[frequency]
+        for finer in reversed(FREQUENCIES[:FREQUENCIES.index(frequency)]):
+            if seconds % FREQUENCY_SECONDS[finer] == 0 and self.has(security, finer):
+                return resample(self.bars(security, finer), frequency)
+        raise IOError("bar 存储中没有 %s %s 的数据: %s" % (security, frequency, self.root))
+
+    def writer(self, security, frequency):
+        return ColumnWriter(self, security, frequency)
+
+    def write(self, security, frequency, bars):
+        writer = self.writer(security, frequency)
+        writer.append(bars)
+        writer.close()
+
+    def write_frequencies(self, security, bars, frequency="1m"):
+        # 写入 frequency 的 bar，并聚合出所有更粗的频率
+        self.write(security, frequency, bars)
+        seconds = FREQUENCY_SECONDS[frequency]
+        for coarser in FREQUENCIES[FREQUENCIES.index(frequency) + 1:]:
+            if FREQUENCY_SECONDS[coarser] % seconds == 0:
+                self.write(security, coarser, resample(bars, coarser))
+
+
+class ColumnWriter(object):
+    # 分块追加写入一个 security/frequency。先写临时文件，close 时再改名并写 meta，
+    # 避免正在读的 memmap 看到写了一半的数据
+    def __init__(self, store, security, frequency):
+        self.store = store
+        self.security = security
+        self.frequency = frequency
+        self.directory = store.path(security, frequency)
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.files = [open(os.path.join(self.directory, filename + ".tmp"), "wb") for _, _, filename in COLUMNS]
+        self.length = 0
+        self.first = None
+        self.last = None
+
+    def append(self, bars):
+        if len(bars) == 0:
+            return
+        for f, (name, dtype, _) in zip(self.files, COLUMNS):
+            np.ascontiguousarray(bars[name], dtype=dtype).tofile(f)
+        if self.first is None:
+            self.first = int(bars.timestamp[0])
+        self.last = int(bars.timestamp[-1])
+        self.length += len(bars)
+
+    def abort(self):
+        # 写到一半出错时放弃：关闭并删除临时文件，已有的数据不变
+        for f in self.files:
+            f.close()
+            try:
+                os.remove(f.name)
+            except OSError:
+                pass
+        # 新建的空目录一并删除
+        for directory in (self.directory, os.path.dirname(self.directory)):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+
+    def close(self, **extra):
+        # extra 中的字段一并写入 meta.json
+        for f, (_, _, filename) in zip(self.files, COLUMNS):
+            f.close()
+            target = os.path.join(self.directory, filename)
+            os.replace(target + ".tmp", target)
+        meta = {"security": self.security, "frequency": self.frequency, "length": self.length}
+        if self.length:
+            meta["first"] = self.first
+            meta["last"] = self.last
+        meta.update(extra)
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        # 数据变了，旧的索引作废
+        shutil.rmtree(os.path.join(self.directory, "index"), ignore_errors=True)
+        with open(os.path.join(self.store.root, MARKER), "w") as f:
+            json.dump({"fields": [name for name, _, _ in COLUMNS]}, f)
+        self.store._cache.pop((self.security, self.frequency), None)
+        return meta
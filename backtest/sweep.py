@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# 参数扫描：对同一个策略的多组 user_data 参数并行回测，结果汇总成一张表。
+# 每个进程只打开一次 bar 存储，行情通过 memmap 在进程之间共享（只读），不会复制到每个进程。
+#
+#     combos = grid(T=[10, 20, 30], limit_unit=[2, 4])
+#     table = sweep("wequant/tutle/ltc.py", "data/", combos, workers=8)
+
+import itertools
+import logging
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from . import prefix
+from .engine import Engine, load_strategy
+from .feed import open_feed
+
+# 每个工作进程自己的行情数据源，按目录缓存
+_feeds = {}
+
+
+def grid(**axes):
+    # grid(T=[10, 20], K1=[0.2, 0.3]) -> 4 组参数
+    names = sorted(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*[axes[name] for name in names])]
+
+
+def _sample(bounds, u):
+    # bounds 为 (low, high) 时在区间内取值，两端都是整数则取整数；为 list 时按 u 选一个
+    if isinstance(bounds, list):
+        return bounds[min(int(u * len(bounds)), len(bounds) - 1)]
+    low, high = bounds
+    if isinstance(low, int) and isinstance(high, int):
+        return min(low + int(u * (high - low + 1)), high)
+    return low + u * (high - low)
+
+
+def random_samples(space, n, seed=None):
+    rng = random.Random(seed)
+    names = sorted(space)
+    return [dict((name, _sample(space[name], rng.random())) for name in names) for _ in range(n)]
+
+
+def latin_hypercube(space, n, seed=None):
+    # 每一维分成 n 层，每层恰好取一个点，各维的层随机配对
+    rng = random.Random(seed)
+    names = sorted(space)
+    columns = {}
+    for name in names:
+        strata = [(i + rng.random()) / n for i in range(n)]
+        rng.shuffle(strata)
+        columns[name] = strata
+    return [dict((name, _sample(space[name], columns[name][i])) for name in names) for i in range(n)]
+
+
+def _feed(data_dir):
+    if data_dir not in _feeds:
+        _feeds[data_dir] = open_feed(data_dir)
+    return _feeds[data_dir]
+
+
+def run_one(task):
+    # 在工作进程中执行一组参数，出错时记录错误而不是中断整个扫描
+    strategy, data_dir, params, user_data, mode = task
+    row = dict(user_data)
+    try:
+        engine = Engine(load_strategy(strategy), _feed(data_dir), params=params, user_data=user_data,
+                        log_level=logging.ERROR, log_stream=None, mode=mode)
+        row.update(engine.run().summary())
+    except Exception as e:
+        row["error"] = "%s: %s" % (type(e).__name__, e)
+    return row
+
+
+def sweep(strategy, data_dir, combos, params=None, workers=None, chunksize=1, mode="auto"):
+    import pandas as pd
+
+    tasks = [(strategy, data_dir, params, combo, mode) for combo in combos]
+    # 前缀和在启动工作进程之前生成一次，各组参数通过 memmap 共用
+    prefix.prepare(_feed(data_dir))
+    if workers == 1:
+        rows = [run_one(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(run_one, tasks, chunksize=chunksize))
+    return pd.DataFrame(rows)
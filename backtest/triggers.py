@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# 价格触发：策略在 handle_data 中登记 "价格到达这些价位之前不会有任何动作"，
+# 引擎用 bar 的最高 / 最低价向后查找第一根触及价位的 bar，中间的 bar 不再调用 handle_data，
+# 净值按不变的余额和收盘价一次算出。1m 数据上大部分 bar 都很平静，可以省掉绝大多数调用。
+#
+#     if hasattr(context, "triggers"):
+#         context.triggers.add(context.security, below=base_price * 0.97, above=base_price * 1.2)
+#
+# 用最高 / 最低价判断，触及价位的 bar 一定会被调用（收盘价在最高最低价之间），不会漏掉信号；
+# 登记只对这一次 handle_data 有效，被唤醒后要重新登记，没有登记时每根 bar 都调用。
+
+import numpy as np
+
+from .bars import parse_time
+
+# 向后查找时第一块的 bar 数，之后每块翻倍
+SEARCH_CHUNK = 256
+
+
+class Triggers(object):
+    def __init__(self, data):
+        self.data = data
+        # security -> [below, above]
+        self.levels = {}
+        self.until = None
+
+    def clear(self):
+        self.levels = {}
+        self.until = None
+
+    @property
+    def active(self):
+        return bool(self.levels) or self.until is not None
+
+    def add(self, security, below=None, above=None):
+        # 最低价 <= below 或最高价 >= above 时唤醒；多次登记同一标的时取最近的价位
+        level = self.levels.setdefault(security, [None, None])
+        if below is not None:
+            level[0] = float(below) if level[0] is None else max(level[0], float(below))
+        if above is not None:
+            level[1] = float(above) if level[1] is None else min(level[1], float(above))
+
+    def wake_at(self, time):
+        # 最晚在 time（时间字符串或秒）开始的 bar 唤醒，如 R-Breaker 在新的一天开始时更新价位
+        timestamp = parse_time(time) if isinstance(time, str) else int(time)
+        self.until = timestamp if self.until is None else min(self.until, timestamp)
+
+    def next_wake(self, timestamps, start):
+        # timestamps 为回测时间轴，返回下一次需要调用 handle_data 的下标（>= start），一直不需要时为 len(timestamps)
+        stop = len(timestamps)
+        if self.until is not None:
+            stop = min(stop, int(np.searchsorted(timestamps, self.until, side="left")))
+        for security, (below, above) in self.levels.items():
+            if stop <= start:
+                break
+            bars = self.data.bars(security)
+            k = bars.search(timestamps[start - 1])
+            end = bars.search(timestamps[stop - 1])
+            size = SEARCH_CHUNK
+            while k < end:
+                chunk = min(end, k + size)
+                hit = np.zeros(chunk - k, dtype=bool)
+                if below is not None:
+                    hit |= bars.low[k:chunk] <= below
+                if above is not None:
+                    hit |= bars.high[k:chunk] >= above
+                if hit.any():
+                    timestamp = bars.timestamp[k + int(np.argmax(hit))]
+                    stop = min(stop, int(np.searchsorted(timestamps, timestamp, side="left")))
+                    break
+                k = chunk
+                size *= 2
+        return max(stop, start)
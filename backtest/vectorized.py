@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+# 向量化的 signal 模式：策略定义 signals(context, bars)，对整段历史返回两个布尔数组 (entries, exits)，
+# 引擎用几次 numpy 运算算出持仓、手续费、滑点和每根 bar 的净值，不再逐 bar 调用 handle_data。
+#
+# 交易规则与 handle_data 里常见的全仓写法一致：空仓时遇到 entries 以收盘价加滑点全仓买入，
+# 持仓时遇到 exits 以收盘价减滑点全部卖出；同一根 bar 两个信号都有时以卖出为准。
+# 信号只能用当根 bar 及以前的数据，引擎不检查未来函数。交易所最小下单量不参与计算。
+
+import numpy as np
+
+from .constants import CASH
+from .order import Trade
+
+
+def positions(entries, exits):
+    # 每根 bar 收盘后的持仓（0 或 1）
+    state = np.where(exits, 0.0, np.where(entries, 1.0, np.nan))
+    index = np.where(np.isnan(state), -1, np.arange(len(state)))
+    index = np.maximum.accumulate(index)
+    return np.where(index >= 0, state[np.maximum(index, 0)], 0.0)
+
+
+def run_signals(engine, first, last):
+    from .engine import Result
+
+    context, params = engine.context, engine.params
+    initial = params["account_initial"]
+    if any(amount for asset, amount in initial.items() if asset != CASH):
+        raise ValueError("signal 模式只支持初始账户全部为现金")
+    commission, slippage = float(params["commission"]), float(params["slippage"])
+
+    security = context.security
+    bars = context.data.bars(security)
+    entries, exits = engine.strategy.signals(context, bars)
+    entries = np.asarray(entries, dtype=bool)[first:last]
+    exits = np.asarray(exits, dtype=bool)[first:last]
+    close = np.asarray(bars.close[first:last])
+    timestamps = np.array(bars.timestamp[first:last])
+
+    position = positions(entries, exits)
+    held = np.r_[0.0, position[:-1]]
+    buys = (position == 1) & (held == 0)
+    sells = (position == 0) & (held == 1)
+
+    # 净值的对数收益：持仓期间随收盘价变化，买入、卖出时分别扣掉滑点和佣金
+    returns = np.zeros(len(close))
+    returns[1:] = held[1:] * np.log(close[1:] / close[:-1])
+    returns += buys * np.log((1 - commission) / (1 + slippage))
+    returns += sells * np.log((1 - slippage) * (1 - commission))
+    net = float(initial.get(CASH, 0.0)) * np.exp(np.cumsum(returns))
+
+    trades = []
+    coins = net / close
+    for order_id, i in enumerate(np.flatnonzero(buys | sells), 1):
+        if buys[i]:
+            price = close[i] * (1 + slippage)
+            quantity = coins[i] / (1 - commission)
+            trades.append(Trade(order_id, timestamps[i], security, "buy", price, quantity,
+                                quantity * commission * price))
+        else:
+            price = close[i] * (1 - slippage)
+            quantity = coins[i - 1]
+            trades.append(Trade(order_id, timestamps[i], security, "sell", price, quantity,
+                                quantity * price * commission))
+    return Result(timestamps, net, engine.benchmark_prices(timestamps), trades, context.user_data.as_dict())
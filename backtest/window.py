@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# get_price 返回的历史窗口。HistoryWindow 只记录 bar 存储中的 [start, stop) 区间，
+# hist["close"]、hist.iloc[...]、hist.index 都是底层数组的只读视图，每根 bar 不再构造 DataFrame。
+# 脚本用到的 pandas 写法（hist["close"][-1]、.iloc、.max()、.shift()、.rolling() 等）都保持可用。
+
+import numpy as np
+import pandas as pd
+
+from .constants import FIELDS
+
+
+class HistSeries(pd.Series):
+    # 平台时代的 pandas 在时间索引上用整数下标按位置取值，策略里大量使用 hist["close"][-1]
+    @property
+    def _constructor(self):
+        return HistSeries
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)) and not isinstance(key, bool):
+            return self.iloc[key]
+        return pd.Series.__getitem__(self, key)
+
+
+class HistFrame(pd.DataFrame):
+    @property
+    def _constructor(self):
+        return HistFrame
+
+    @property
+    def _constructor_sliced(self):
+        return HistSeries
+
+
+class Column(np.ndarray):
+    # 一列数据的视图。整数下标和切片本来就是按位置的，.iloc/.values 返回自身；
+    # 其它 pandas 方法（shift、rolling 等）转成 Series 再调用
+    @property
+    def iloc(self):
+        return self
+
+    @property
+    def values(self):
+        return self
+
+    def to_series(self):
+        return HistSeries(np.asarray(self))
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.to_series(), name)
+
+
+def column(array, cls=Column):
+    view = array.view(cls)
+    view.flags.writeable = False
+    return view
+
+
+def readonly(array):
+    # 普通 ndarray 的只读视图，给 get_price_array 用
+    return column(array, np.ndarray)
+
+
+class _ILoc(object):
+    def __init__(self, window):
+        self.window = window
+
+    def __getitem__(self, key):
+        window = self.window
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(window))
+            if step != 1:
+                raise IndexError("HistoryWindow.iloc 只支持步长为 1 的切片")
+            return HistoryWindow(window.bars, window.start + start, window.start + max(start, stop))
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(window)
+            if not 0 <= key < len(window):
+                raise IndexError(key)
+            i = window.start + key
+            return dict((field, window.bars[field][i]) for field in FIELDS)
+        raise TypeError("HistoryWindow.iloc 不支持 %r" % (key,))
+
+
+class HistoryWindow(object):
+    def __init__(self, bars, start, stop):
+        self.bars = bars
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, field):
+        return column(self.bars[field][self.start:self.stop])
+
+    def __getattr__(self, name):
+        if name in FIELDS:
+            return self[name]
+        if name.startswith("_"):
+            raise AttributeError(name)
+        # 不常用的 DataFrame 方法（tail、describe ...）退回到真正的 DataFrame
+        return getattr(self.to_frame(), name)
+
+    @property
+    def iloc(self):
+        return _ILoc(self)
+
+    @property
+    def index(self):
+        return self.bars.timestamp[self.start:self.stop].view("datetime64[s]")
+
+    @property
+    def empty(self):
+        return self.stop == self.start
+
+    def to_frame(self):
+        index = pd.DatetimeIndex(self.index, name="datetime")
+        return HistFrame(dict((field, self.bars[field][self.start:self.stop]) for field in FIELDS),
+                         index=index, columns=FIELDS, copy=False)
+
+    def __repr__(self):
+        return repr(self.to_frame())
+
+
+class PriceArrays(object):
+    # get_price_arrays 的结果：arrays["close"] 或 arrays.close 为该字段的只读 ndarray 视图，取的时候才切片。
+    # bar 存储按列保存，各字段不在同一块内存里，所以不是真正的结构化数组；需要时 to_records() 复制出一个
+    def __init__(self, bars, start, stop, fields):
+        self.bars = bars
+        self.start = start
+        self.stop = stop
+        self.fields = tuple(fields)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, field):
+        if field not in self.fields:
+            raise KeyError(field)
+        return readonly(self.bars[field][self.start:self.stop])
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in self.fields:
+            raise AttributeError(name)
+        return self[name]
+
+    @property
+    def timestamp(self):
+        # bar 的起始时间（秒）
+        return readonly(self.bars.timestamp[self.start:self.stop])
+
+    def to_records(self):
+        return np.rec.fromarrays([self.timestamp] + [self[field] for field in self.fields],
+                                 names=("timestamp",) + self.fields)
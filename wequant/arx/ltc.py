@@ -53,18 +53,26 @@ def initialize(context):
 # handle_data函数定义了策略的执行逻辑，按照frequency生成的bar依次读取并执行策略逻辑，直至程序结束。
 # handle_data和bar的详细说明，请参考新手学堂的解释文档。
 def handle_data(context):
-    # 获取回看时间窗口内的历史数据
-    hist = context.data.get_price(context.security, count=context.user_data.period, frequency=context.frequency)
-    if len(hist.index) < context.user_data.period:
-        context.log.warn("bar的数量不足, 等待下一根bar...")
-        return
-    # 开盘价
-    open_prices = np.array(hist["open"])
-    # 最高价
-    high_prices = np.array(hist["high"])
-    # 最低价
-    low_prices = np.array(hist["low"])
-    # 计算AR值
-    ar = sum(high_prices - open_prices) / sum(open_prices - low_prices) * 100
+    if hasattr(context, "indicators"):
+        # 本地回测：high - open 和 open - low 的滚动和逐根更新
+        ar = context.indicators.AR(context.security, timeperiod=context.user_data.period, frequency=context.frequency)
+        if len(ar) < context.user_data.period:
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+        ar = ar[-1]
+    else:
+        # 获取回看时间窗口内的历史数据
+        hist = context.data.get_price(context.security, count=context.user_data.period, frequency=context.frequency)
+        if len(hist.index) < context.user_data.period:
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+        # 开盘价
+        open_prices = np.array(hist["open"])
+        # 最高价
+        high_prices = np.array(hist["high"])
+        # 最低价
+        low_prices = np.array(hist["low"])
+        # 计算AR值
+        ar = sum(high_prices - open_prices) / sum(open_prices - low_prices) * 100
 
     context.log.info("%s" % ar)
@@ -60,7 +60,12 @@ def handle_data(context):
     price = context.data.get_current_price(context.security)
 
     # 1 计算ATR
-    atr = calc_atr(hist)
+    if hasattr(context, "indicators"):
+        # 本地回测：真实波幅向量化一次算出，结果与下面的 calc_atr 相同，不再逐根 iloc 循环
+        from backtest.indicators.atr import calc_atr as vector_atr
+        atr = vector_atr(hist)
+    else:
+        atr = calc_atr(hist)
     context.log.info("%s"%(atr))
 
 
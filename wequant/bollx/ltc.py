@@ -55,20 +55,27 @@ def initialize(context):
 # handle_data函数定义了策略的执行逻辑，按照frequency生成的bar依次读取并执行策略逻辑，直至程序结束。
 # handle_data和bar的详细说明，请参考新手学堂的解释文档。
 def handle_data(context):
-    # 获取历史数据
-    hist = context.data.get_price(context.security, count=context.user_data.period_window + context.user_data.bbands_opt_width_m + 1, frequency=context.frequency)
-    if len(hist.index) < (context.user_data.period_window + context.user_data.bbands_opt_width_m + 1):
-        context.log.warn("bar的数量不足, 等待下一根bar...")
-        return
-    # 获取收盘价
-    prices = np.array(hist["close"])
+    if hasattr(context, "indicators"):
+        # 本地回测：布林线用滚动和逐根更新，不用每根 bar 对整个窗口重新调用 talib
+        upper, middle, lower = context.indicators.BBANDS(context.security, timeperiod=context.user_data.period_window, nbdevup=context.user_data.standard_deviation_range, nbdevdn=context.user_data.standard_deviation_range, matype=0)
+        if len(upper) < (context.user_data.period_window + context.user_data.bbands_opt_width_m + 1):
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+    else:
+        # 获取历史数据
+        hist = context.data.get_price(context.security, count=context.user_data.period_window + context.user_data.bbands_opt_width_m + 1, frequency=context.frequency)
+        if len(hist.index) < (context.user_data.period_window + context.user_data.bbands_opt_width_m + 1):
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+        # 获取收盘价
+        prices = np.array(hist["close"])
+        # 使用talib计算布林线的上中下三条线
+        upper, middle, lower = talib.BBANDS(prices, timeperiod=context.user_data.period_window, nbdevup=context.user_data.standard_deviation_range, nbdevdn=context.user_data.standard_deviation_range, matype=talib.MA_Type.SMA)
+
     # 初始化做多/做空信号
     long_signal_triggered = False
     short_signal_triggered = False
 
-    # 使用talib计算布林线的上中下三条线
-    upper, middle, lower = talib.BBANDS(prices, timeperiod=context.user_data.period_window, nbdevup=context.user_data.standard_deviation_range, nbdevdn=context.user_data.standard_deviation_range, matype=talib.MA_Type.SMA)
-
     # 获取最新价格
     current_price = context.data.get_current_price(context.security)
 
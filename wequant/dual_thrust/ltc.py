@@ -116,16 +116,23 @@ def handle_data(context):
     # 取得最近1 根 bar的close价格
     latest_close_price = context.data.get_current_price(context.security)
 
-    # 开始计算N日最高价的最高价HH，N日收盘价的最高价HC，N日收盘价的最低价LC，N日最低价的最低价LL
-    hh = np.max(hist["high"].iloc[-context.user_data.window_size-1:-1])
-    hc = np.max(hist["close"].iloc[-context.user_data.window_size-1:-1])
-    lc = np.min(hist["close"].iloc[-context.user_data.window_size-1:-1])
-    ll = np.min(hist["low"].iloc[-context.user_data.window_size-1:-1])
-    price_range = max(hh - lc, hc - ll)
-
-    # 取得倒数第二根bar的close, 并计算上下界限
-    up_bound = hist["open"].iloc[-1] + context.user_data.K1 * price_range
-    low_bound = hist["open"].iloc[-1] - context.user_data.K2 * price_range
+    if hasattr(context, "indicators"):
+        # 本地回测：上下轨对整段历史只算一次，按下标读取
+        up_bounds, low_bounds = context.indicators.DUAL_THRUST(context.security, context.user_data.window_size,
+                                                               context.user_data.K1, context.user_data.K2)
+        up_bound = up_bounds[-1]
+        low_bound = low_bounds[-1]
+    else:
+        # 开始计算N日最高价的最高价HH，N日收盘价的最高价HC，N日收盘价的最低价LC，N日最低价的最低价LL
+        hh = np.max(hist["high"].iloc[-context.user_data.window_size-1:-1])
+        hc = np.max(hist["close"].iloc[-context.user_data.window_size-1:-1])
+        lc = np.min(hist["close"].iloc[-context.user_data.window_size-1:-1])
+        ll = np.min(hist["low"].iloc[-context.user_data.window_size-1:-1])
+        price_range = max(hh - lc, hc - ll)
+
+        # 取得倒数第二根bar的close, 并计算上下界限
+        up_bound = hist["open"].iloc[-1] + context.user_data.K1 * price_range
+        low_bound = hist["open"].iloc[-1] - context.user_data.K2 * price_range
 
     context.log.info("当前 价格：%s, 上轨：%s, 下轨: %s" % (latest_close_price, up_bound, low_bound))
 
@@ -46,31 +46,41 @@ def initialize(context):
 # handle_data函数定义了策略的执行逻辑，按照frequency生成的bar依次读取并执行策略逻辑，直至程序结束。
 # handle_data和bar的详细说明，请参考新手学堂的解释文档。
 def handle_data(context):
-    # 获取历史数据
-    hist = context.data.get_price(context.security, count=context.user_data.emv_period + 2, frequency=context.frequency)
-    if len(hist.index) < (context.user_data.emv_period + 2):
-        context.log.warn("bar的数量不足, 等待下一根bar...")
-        return
+    if hasattr(context, "indicators"):
+        # 本地回测：EMV 用滚动和逐根更新，不用每根 bar 重新构造 pandas Series
+        emv = context.indicators.EMV(context.security, timeperiod=context.user_data.emv_period, frequency=context.frequency)
+        if len(emv) < (context.user_data.emv_period + 2):
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+        emv_current, emv_prev = emv[-1], emv[-2]
+        price = context.data.get_current_price(context.security)
+    else:
+        # 获取历史数据
+        hist = context.data.get_price(context.security, count=context.user_data.emv_period + 2, frequency=context.frequency)
+        if len(hist.index) < (context.user_data.emv_period + 2):
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
 
-    # 每根bar的最高价
-    high = hist["high"]
-    # 每根bar的最低价
-    low = hist["low"]
-    # 每根bar的成交量（数量）
-    vol = hist["volume"]
-    close = hist["close"]
+        # 每根bar的最高价
+        high = hist["high"]
+        # 每根bar的最低价
+        low = hist["low"]
+        # 每根bar的成交量（数量）
+        vol = hist["volume"]
+        close = hist["close"]
 
-    # 计算EMV
-    a = (high + low) / 2
-    b = a.shift(1)
-    c = high - low
-    em = (a - b) * c / vol
-    emv = em.rolling(window=context.user_data.emv_period).sum()
+        # 计算EMV
+        a = (high + low) / 2
+        b = a.shift(1)
+        c = high - low
+        em = (a - b) * c / vol
+        emv = em.rolling(window=context.user_data.emv_period).sum()
 
-    # 当前bar的EMV值
-    emv_current = emv[len(emv)-1]
-    # 前一根bar的EMV值
-    emv_prev = emv[len(emv)-2]
+        # 当前bar的EMV值
+        emv_current = emv[len(emv)-1]
+        # 前一根bar的EMV值
+        emv_prev = emv[len(emv)-2]
+        price = close[-1]
 
     context.log.info("当前 EMV = %s; 前一根bar EMV = %s" % (emv_current, emv_prev))
 
@@ -81,7 +91,7 @@ def handle_data(context):
             # 有买入信号，且持有现金，则市价单全仓买入
             context.log.info("正在买入 %s" % context.security)
             context.log.info("下单金额为 %s 元" % context.account.huobi_cny_cash)
-            context.order.buy_limit(context.security, quantity=str(context.account.huobi_cny_cash/close[-1]*0.98), price=str(close[-1]*1.02))
+            context.order.buy_limit(context.security, quantity=str(context.account.huobi_cny_cash/price*0.98), price=str(price*1.02))
         else:
             context.log.info("现金不足，无法下单")
     # EMV从上向下穿过零轴，卖出信号
@@ -91,7 +101,7 @@ def handle_data(context):
             # 有卖出信号，且持有仓位，则市价单全仓卖出
             context.log.info("正在卖出 %s" % context.security)
             context.log.info("卖出数量为 %s" % context.account.huobi_cny_btc)
-            context.order.sell_limit(context.security, quantity=str(context.account.huobi_cny_btc), price=str(close[-1]*0.98))
+            context.order.sell_limit(context.security, quantity=str(context.account.huobi_cny_btc), price=str(price*0.98))
         else:
             context.log.info("仓位不足，无法卖出")
     else:
@@ -63,21 +63,29 @@ def initialize(context):
 # handle_data函数定义了策略的执行逻辑，按照frequency生成的bar依次读取并执行策略逻辑，直至程序结束。
 # handle_data和bar的详细说明，请参考新手学堂的解释文档。
 def handle_data(context):
-    # 获取历史数据, 取后longest_history根bar
-    hist = context.data.get_price(context.security, count=context.user_data.longest_history, frequency=context.frequency)
-    if len(hist.index) < context.user_data.longest_history:
-        context.log.warn("bar的数量不足, 等待下一根bar...")
-        return
-    # 最高价
-    high_prices = np.array(hist["high"])
-    # 最低价
-    low_prices = np.array(hist["low"])
-    # 收盘价
-    close_prices = np.array(hist["close"])
-
-    # matype: 0=SMA, 1=EMA, 2=WMA, 3=DEMA, 4=TEMA, 5=TRIMA, 6=KAMA, 7=MAMA, 8=T3 (Default=SMA)
-    # 用talib计算K，D两条线
-    K, D = talib.STOCH(high_prices, low_prices, close_prices, fastk_period=context.user_data.fastk_period, slowk_matype=context.user_data.slowk_matype, slowk_period=context.user_data.slowk_period, slowd_period=context.user_data.slowd_period)
+    if hasattr(context, "indicators"):
+        # 本地回测：K、D 用滚动最高最低价和滚动均值逐根更新，不用每根 bar 对整个窗口重新调用 talib
+        K, D = context.indicators.STOCH(context.security, fastk_period=context.user_data.fastk_period, slowk_period=context.user_data.slowk_period, slowk_matype=context.user_data.slowk_matype, slowd_period=context.user_data.slowd_period)
+        if len(K) < context.user_data.longest_history:
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+    else:
+        # 获取历史数据, 取后longest_history根bar
+        hist = context.data.get_price(context.security, count=context.user_data.longest_history, frequency=context.frequency)
+        if len(hist.index) < context.user_data.longest_history:
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+        # 最高价
+        high_prices = np.array(hist["high"])
+        # 最低价
+        low_prices = np.array(hist["low"])
+        # 收盘价
+        close_prices = np.array(hist["close"])
+
+        # matype: 0=SMA, 1=EMA, 2=WMA, 3=DEMA, 4=TEMA, 5=TRIMA, 6=KAMA, 7=MAMA, 8=T3 (Default=SMA)
+        # 用talib计算K，D两条线
+        K, D = talib.STOCH(high_prices, low_prices, close_prices, fastk_period=context.user_data.fastk_period, slowk_matype=context.user_data.slowk_matype, slowk_period=context.user_data.slowk_period, slowd_period=context.user_data.slowd_period)
+
     current_k_value = K[-1]
     current_d_value = D[-1]
     previous_k_value = K[-2]
@@ -118,3 +126,14 @@ def handle_data(context):
             context.log.info("现金不足，无法下单")
     else:
         context.log.info("无交易信号，进入下一根bar")
+
+
+# 阅读4，可选：本地回测引擎的向量化模式（python -m backtest run ... --mode signal）。
+# signals函数对整段历史一次性算出买卖信号，与handle_data的判断条件相同；平台上不会调用这个函数。
+def signals(context, bars):
+    K, D = talib.STOCH(np.asarray(bars["high"]), np.asarray(bars["low"]), np.asarray(bars["close"]), fastk_period=context.user_data.fastk_period, slowk_matype=context.user_data.slowk_matype, slowk_period=context.user_data.slowk_period, slowd_period=context.user_data.slowd_period)
+    previous_k = np.r_[np.nan, K[:-1]]
+    previous_d = np.r_[np.nan, D[:-1]]
+    long_signal = (D < context.user_data.over_sell_signal) & (D > previous_d) & (K > previous_k) & (previous_k < previous_d) & (K > D)
+    short_signal = (D > context.user_data.over_buy_signal) & (D < previous_d) & (K < previous_k) & (previous_k > previous_d) & (K < D)
+    return long_signal, short_signal
@@ -177,7 +177,36 @@ def handle_data(context):
             context.log.info("正在卖出 %s" % str(quantity))
             context.order.sell(context.security, quantity=str(quantity))
 
+    # 本地回测：不需要调仓时（价格在 buy1 和 sell1 之间，或已经满仓 / 空仓），价格离开当前档位之前都不会有操作，
+    # 登记档位的边界和止盈止损对应的价格，引擎直接跳到价格触及这些价位的 bar
+    if cash_to_spent == 0 and hasattr(context, "triggers"):
+        below, above = grid_band(context, price)
+        coins = context.account.huobi_cny_ltc
+        if coins > 0:
+            initial = context.account_initial.huobi_cny_net
+            cash = context.account.huobi_cny_cash
+            stop_loss = (context.user_data.portfolio_stop_loss * initial - cash) / coins
+            stop_win = (context.user_data.portfolio_stop_win * initial - cash) / coins
+            below = stop_loss if below is None else max(below, stop_loss)
+            above = stop_win if above is None else min(above, stop_win)
+        context.triggers.add(context.security, below=below, above=above)
+
 
 # 计算为达到目标仓位所需要购买的金额
 def cash_to_spent_fn(net_asset, target_ratio, available_cny):
     return available_cny - net_asset * (1 - target_ratio)
+
+
+# 当前价格所在档位的上下边界，与 handle_data 中划分档位的比较方式相同；最低档没有下边界、最高档没有上边界
+def grid_band(context, price):
+    base = context.user_data.base_price
+    buys = [context.user_data.buy4, context.user_data.buy3, context.user_data.buy2, context.user_data.buy1]
+    sells = [context.user_data.sell4, context.user_data.sell3, context.user_data.sell2, context.user_data.sell1]
+    ratio = price / base
+    for lower, upper in zip([None] + buys[:-1], buys):
+        if ratio < upper:
+            return (None if lower is None else base * lower), base * upper
+    for upper, lower in zip([None] + sells[:-1], sells):
+        if ratio > lower:
+            return base * lower, (None if upper is None else base * upper)
+    return base * buys[-1], base * sells[-1]
@@ -41,51 +41,71 @@ def initialize(context):
 # handle_data函数定义了策略的执行逻辑，按照frequency生成的bar依次读取并执行策略逻辑，直至程序结束。
 # handle_data和bar的详细说明，请参考新手学堂的解释文档。
 def handle_data(context):
-    # 获取回看时间窗口内的历史数据
-    hist = context.data.get_price(context.security, count=1, frequency='1d')
-    if len(hist.index) < 1:
-        context.log.warn("bar的数量不足, 等待下一根bar...")
-        return
-
-    # 前日最高价
-    high_price = hist['high'][-1]
-    # 前日最低价
-    low_price = hist['low'][-1]
-    # 前日收盘价
-    close_price = hist['close'][-1]
-
-    # 中心点
-    pivot = (high_price + close_price + low_price) / 3
-
-    # R-Breaker的阻力线和支撑线
-    # 趋势策略-突破买入价
-    buy_break = high_price + 2 * (pivot - low_price)
-    # 反转策略-观察卖出价
-    sell_setup = pivot + (high_price - low_price)
-    # 反转策略-反转卖出价
-    sell_enter = 2 * pivot - low_price
-    # 反转策略-反转买入价
-    buy_enter = 2 * pivot - high_price
-    # 反转策略-观察买入价
-    buy_setup = pivot - (high_price - low_price)
-    # 趋势策略-突破卖出价
-    sell_break = low_price - 2 * (high_price - pivot)
+    if hasattr(context, "indicators"):
+        # 本地回测：六个价位按日线整段预先算好，[-1] 为用前一日日线算出的价位
+        levels = context.indicators.RBREAKER(context.security)
+        if len(levels["pivot"]) < 1:
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+        buy_break = levels["buy_break"][-1]
+        sell_setup = levels["sell_setup"][-1]
+        sell_enter = levels["sell_enter"][-1]
+        buy_enter = levels["buy_enter"][-1]
+        buy_setup = levels["buy_setup"][-1]
+        sell_break = levels["sell_break"][-1]
+    else:
+        # 获取回看时间窗口内的历史数据
+        hist = context.data.get_price(context.security, count=1, frequency='1d')
+        if len(hist.index) < 1:
+            context.log.warn("bar的数量不足, 等待下一根bar...")
+            return
+
+        # 前日最高价
+        high_price = hist['high'][-1]
+        # 前日最低价
+        low_price = hist['low'][-1]
+        # 前日收盘价
+        close_price = hist['close'][-1]
+
+        # 中心点
+        pivot = (high_price + close_price + low_price) / 3
+
+        # R-Breaker的阻力线和支撑线
+        # 趋势策略-突破买入价
+        buy_break = high_price + 2 * (pivot - low_price)
+        # 反转策略-观察卖出价
+        sell_setup = pivot + (high_price - low_price)
+        # 反转策略-反转卖出价
+        sell_enter = 2 * pivot - low_price
+        # 反转策略-反转买入价
+        buy_enter = 2 * pivot - high_price
+        # 反转策略-观察买入价
+        buy_setup = pivot - (high_price - low_price)
+        # 趋势策略-突破卖出价
+        sell_break = low_price - 2 * (high_price - pivot)
 
     # 获取当前价格
     current_price = context.data.get_current_price(context.security)
 
-    d = context.time.get_current_bar_time().date()
-    # 当前bar所在日期的开始时间
-    today_start_time = datetime.combine(d, datetime.min.time())
-    # 转化为字符串
-    today_start_time = today_start_time.strftime("%Y-%m-%d %H:%M:%S")
-    # 获取本日历史数据
-    today_hist = context.data.get_price(context.security, start_time=today_start_time, frequency=context.frequency)
-
-    # 当日最高价
-    today_high = today_hist['high'].max()
-    # 当日最低价
-    today_low = today_hist['low'].min()
+    if hasattr(context.data, "get_session_stats"):
+        # 本地回测：当日最高价、最低价按 bar 累加，不用每根 bar 重新取整天的数据
+        session = context.data.get_session_stats(context.security)
+        today_high = session.high
+        today_low = session.low
+    else:
+        d = context.time.get_current_bar_time().date()
+        # 当前bar所在日期的开始时间
+        today_start_time = datetime.combine(d, datetime.min.time())
+        # 转化为字符串
+        today_start_time = today_start_time.strftime("%Y-%m-%d %H:%M:%S")
+        # 获取本日历史数据
+        today_hist = context.data.get_price(context.security, start_time=today_start_time,
+                                            frequency=context.frequency)
+
+        # 当日最高价
+        today_high = today_hist['high'].max()
+        # 当日最低价
+        today_low = today_hist['low'].min()
 
     context.log.info("当前价格=%.2f,日内最高价=%.2f" % (current_price, today_high))
     context.log.info("突破买入价=%.2f，观察卖出价=%.2f，反转卖出价=%.2f，反转买入价=%.2f，观察买入价=%.2f，突破卖出价=%.2f"
@@ -62,6 +62,10 @@ def initialize(context):
 
 # 是否在上升
 def ma_is_upping(context, array, cp_nice, ma):
+    if hasattr(context, "indicators"):
+        # 本地回测：整段历史的布尔数组预先算好，按下标读取；array 为截止到当前 bar 的收盘价
+        return bool(context.indicators.ma_trend(context.security, ma, cp_nice, rising=True,
+                                                 frequency=context.user_data.buy_frenquency)[-1])
     move_god = 0
     while cp_nice > 0 :
         cp_nice -=1
@@ -83,6 +87,10 @@ def ma_is_upping(context, array, cp_nice, ma):
 
 # 是否在下降
 def ma_is_downing(context, array, cp_nice, ma):
+    if hasattr(context, "indicators"):
+        # 本地回测：整段历史的布尔数组预先算好，按下标读取；array 为截止到当前 bar 的收盘价
+        return bool(context.indicators.ma_trend(context.security, ma, cp_nice, rising=False,
+                                                 frequency=context.user_data.buy_frenquency)[-1])
     move_god = 0
 
     while cp_nice > 0 :
@@ -296,9 +304,15 @@ def handle_data(context):
 
     # 计算短均线值
     close = np.array(hist["close"])
-    short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
-    # 计算长均线值
-    long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
+    if hasattr(context, "indicators"):
+        # 本地回测：收盘价前缀和相减得到均线，不同窗口和扫描中的各组参数共用
+        sums = context.indicators.prefix_sums(context.security, frequency=context.user_data.long_period)
+        short_mean = sums.last_mean(context.user_data.window_short)
+        long_mean = sums.last_mean(context.user_data.window_long)
+    else:
+        short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
+        # 计算长均线值
+        long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
 
     # 价格上轨
     upper = long_mean + context.user_data.enter_threshold * long_mean
@@ -339,9 +353,15 @@ def handle_data(context):
 
     # 计算短均线值
     close = np.array(hist["close"])
-    short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
-    # 计算长均线值
-    long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
+    if hasattr(context, "indicators"):
+        # 本地回测：收盘价前缀和相减得到均线，不同窗口和扫描中的各组参数共用
+        sums = context.indicators.prefix_sums(context.security, frequency=context.user_data.short_period)
+        short_mean = sums.last_mean(context.user_data.window_short)
+        long_mean = sums.last_mean(context.user_data.window_long)
+    else:
+        short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
+        # 计算长均线值
+        long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
 
     # 价格上轨
     upper = long_mean + context.user_data.enter_threshold * long_mean
@@ -439,9 +459,15 @@ def handle_data(context):
 
     # 计算短均线值
     close = np.array(hist["close"])
-    short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
-    # 计算长均线值
-    long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
+    if hasattr(context, "indicators"):
+        # 本地回测：收盘价前缀和相减得到均线，不同窗口和扫描中的各组参数共用
+        sums = context.indicators.prefix_sums(context.security, frequency=context.user_data.long_period)
+        short_mean = sums.last_mean(context.user_data.window_short)
+        long_mean = sums.last_mean(context.user_data.window_long)
+    else:
+        short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
+        # 计算长均线值
+        long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
 
     # 价格上轨
     upper = long_mean + context.user_data.enter_threshold * long_mean
@@ -482,9 +508,15 @@ def handle_data(context):
 
     # 计算短均线值
     close = np.array(hist["close"])
-    short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
-    # 计算长均线值
-    long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
+    if hasattr(context, "indicators"):
+        # 本地回测：收盘价前缀和相减得到均线，不同窗口和扫描中的各组参数共用
+        sums = context.indicators.prefix_sums(context.security, frequency=context.user_data.short_period)
+        short_mean = sums.last_mean(context.user_data.window_short)
+        long_mean = sums.last_mean(context.user_data.window_long)
+    else:
+        short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
+        # 计算长均线值
+        long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
 
     # 价格上轨
     upper = long_mean + context.user_data.enter_threshold * long_mean
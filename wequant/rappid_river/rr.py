@@ -65,9 +65,15 @@ def handle_data(context):
 
     # 计算短均线值
     close = np.array(hist["close"])
-    short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
-    # 计算长均线值
-    long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
+    if hasattr(context, "indicators"):
+        # 本地回测：收盘价前缀和相减得到均线，不同窗口和扫描中的各组参数共用
+        sums = context.indicators.prefix_sums(context.security, frequency=context.period)
+        short_mean = sums.last_mean(context.user_data.window_short)
+        long_mean = sums.last_mean(context.user_data.window_long)
+    else:
+        short_mean = np.mean(hist["close"][-1 * context.user_data.window_short:])
+        # 计算长均线值
+        long_mean = np.mean(hist["close"][-1 * context.user_data.window_long:])
 
     # 价格上轨
     upper = long_mean + context.user_data.enter_threshold * long_mean
@@ -56,15 +56,20 @@ def initialize(context):
 # handle_data函数定义了策略的执行逻辑，按照frequency生成的bar依次读取并执行策略逻辑，直至程序结束。
 # handle_data和bar的详细说明，请参考新手学堂的解释文档。
 def handle_data(context):
-    # 获取历史数据, 取后rsi_window根bar
-    hist = context.data.get_price(context.security, count=context.user_data.rsi_window+1,
-                                  frequency=context.frequency)
-    if len(hist.index) < context.user_data.rsi_window+1:
+    if hasattr(context.data, "get_price_array"):
+        # 本地回测：直接取收盘价的只读数组，不经过 pandas
+        prices = context.data.get_price_array(context.security, "close", count=context.user_data.rsi_window+1,
+                                              frequency=context.frequency)
+    else:
+        # 获取历史数据, 取后rsi_window根bar
+        hist = context.data.get_price(context.security, count=context.user_data.rsi_window+1,
+                                      frequency=context.frequency)
+        # 历史收盘价
+        prices = np.array(hist["close"])
+    if len(prices) < context.user_data.rsi_window+1:
         context.log.warn("bar的数量不足, 等待下一根bar...")
         return
 
-    # 历史收盘价
-    prices = np.array(hist["close"])
     # 初始化买入/卖出信号
     long_signal_triggered = False
     short_signal_triggered = False
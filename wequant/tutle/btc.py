@@ -68,8 +68,13 @@ def handle_data(context):
     price = context.data.get_current_price(context.security)
 
     # 1 计算ATR
-    #atr = calc_atr(hist.iloc[:len(hist)-1])
-    atr = calc_atr(hist)
+    if hasattr(context, "indicators"):
+        # 本地回测：真实波幅向量化一次算出，结果与下面的 calc_atr 相同，不再逐根 iloc 循环
+        from backtest.indicators.atr import calc_atr as vector_atr
+        atr = vector_atr(hist)
+    else:
+        #atr = calc_atr(hist.iloc[:len(hist)-1])
+        atr = calc_atr(hist)
 
     # 2 判断加仓或止损
     if context.user_data.hold_flag is True and context.account.huobi_cny_btc > 0:  # 先判断是否持仓
@@ -147,9 +152,14 @@ def init_local_context(context):
 # 用户自定义的函数，可以被handle_data调用: 唐奇安通道计算及判断入场离场
 # data是日线级别的历史数据，price是当前分钟线数据（用来获取当前行情），T代表需要多少根日线
 def in_or_out(context, data, price, T):
-    up = np.max(data["high"].iloc[-T:])
-    # 这里是T/2唐奇安下沿，在向下突破T/2唐奇安下沿卖出而不是在向下突破T唐奇安下沿卖出，这是为了及时止损
-    down = np.min(data["low"].iloc[-int(T / 2):])
+    if hasattr(context, "indicators"):
+        # 本地回测：滚动最高最低价逐根更新，不随 T 变慢。data 截止到当前 bar 的前一根，所以取倒数第二个值
+        up = context.indicators.MAX(context.security, T, field="high")[-2]
+        down = context.indicators.MIN(context.security, int(T / 2), field="low")[-2]
+    else:
+        up = np.max(data["high"].iloc[-T:])
+        # 这里是T/2唐奇安下沿，在向下突破T/2唐奇安下沿卖出而不是在向下突破T唐奇安下沿卖出，这是为了及时止损
+        down = np.min(data["low"].iloc[-int(T / 2):])
     context.log.info("当前价格为: %s, 唐奇安上轨为: %s, 唐奇安下轨为: %s" % (price, up, down))
     # 当前价格升破唐奇安上沿，产生入场信号
     if price > up: